@@ -33,6 +33,14 @@ app.include_router(ai_router)
 app.include_router(run_router)
 app.include_router(automaton_router)  # 👈 נטען אחרון כדי שיעבוד תקין
 app.include_router(pda_router)
+
+
+@app.on_event("startup")
+async def warm_caches():
+    # מכונות הטיורינג המובנות – מאומתות ומקומפלות פעם אחת
+    from services.tm_language_library import load_compiled_library
+    load_compiled_library()
+
 # ====================================================
 # הרצה מקומית
 # ====================================================
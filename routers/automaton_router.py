@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
+from typing import Any, Dict
 from services.automaton_service import generate_automaton_html
+from services.dfa_minimizer import dfa_equivalence, minimize_dfa
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -9,6 +12,16 @@ templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 router = APIRouter()
 
+
+class DfaRequest(BaseModel):
+    dfa: Dict[str, Any]
+
+
+class DfaPairRequest(BaseModel):
+    dfa_a: Dict[str, Any]
+    dfa_b: Dict[str, Any]
+
+
 @router.get("/automaton", response_class=HTMLResponse)
 async def automaton_page(request: Request):
     # תוקן: request מועבר כפרמטר המיקומי הראשון כדי למנוע את שגיאת ה-dict ב-Render
@@ -17,4 +30,24 @@ async def automaton_page(request: Request):
 @router.post("/generate_automaton", response_class=HTMLResponse)
 async def generate_automaton(request: Request, description: str = Form(...)):
     html_result = await generate_automaton_html(description)
-    return html_result
\ No newline at end of file
+    return html_result
+
+
+@router.post("/automaton/minimize", response_class=JSONResponse)
+async def minimize_automaton(payload: DfaRequest):
+    # DFA מינימלי שקול (Hopcroft)
+    try:
+        return JSONResponse(minimize_dfa(payload.dfa))
+    except Exception as e:
+        print("[Minimize] Error:", e)
+        return JSONResponse({"error": "❌ האוטומט אינו DFA תקין."}, status_code=400)
+
+
+@router.post("/automaton/equivalence", response_class=JSONResponse)
+async def automaton_equivalence(payload: DfaPairRequest):
+    # שקילות שני DFA + המילה הקצרה ביותר שמבדילה ביניהם
+    try:
+        return JSONResponse(dfa_equivalence(payload.dfa_a, payload.dfa_b))
+    except Exception as e:
+        print("[Equivalence] Error:", e)
+        return JSONResponse({"error": "❌ אחד האוטומטים אינו DFA תקין."}, status_code=400)
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Query
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from pydantic import BaseModel
-from typing import Any, Dict
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Literal, Optional
 import logging
 
+from services.pda_analysis import analyze_pda
+from services.pda_membership import MAX_BATCH_WORDS, decide_pda_batch, words_up_to
 from services.pda_service import generate_pda, simulate_pda_word
+from services.npda_tree_cursor import close_tree, expand_tree, open_tree
 from services.npda_tree_engine import run_npda_with_tree
 
 logger = logging.getLogger(__name__)
@@ -22,10 +26,29 @@ router = APIRouter()
 
 class PdaSimulationRequest(BaseModel):
     """
-    סימולציה רגילה (מסלול אחד).
+    סימולציה רגילה (מסלול אחד). strategy בוחר את אסטרטגיית החיפוש של ה-Trace.
     """
     pda: Dict[str, Any]
     word: str
+    strategy: Literal["bfs", "iddfs", "best_first"] = "bfs"
+
+
+class PdaBatchSimulationRequest(BaseModel):
+    """
+    הכרעה על הרבה מילים מול אותו אוטומט: words מפורשות ו/או כל המילים עד max_length.
+    """
+    pda: Dict[str, Any]
+    words: List[str] = Field(default_factory=list, max_length=MAX_BATCH_WORDS)
+    max_length: Optional[int] = Field(default=None, ge=0, le=20)
+    # מוסיף את simulation_examples של ה-PDA ומחזיר אי-התאמות
+    include_examples: bool = False
+
+
+class PdaAnalyzeRequest(BaseModel):
+    """
+    ניתוח סטטי של אוטומט (ללא מילה).
+    """
+    pda: Dict[str, Any]
 
 
 class PdaTreeSimulationRequest(BaseModel):
@@ -36,6 +59,20 @@ class PdaTreeSimulationRequest(BaseModel):
     word: str
     max_steps: int = 2000
     max_nodes: int = 4000
+    # "columnar": מערכים מקבילים + טבלת מחסניות, קומפקטי לעצים גדולים
+    format: Literal["nested", "columnar"] = "nested"
+    # "dag": קונפיגורציות זהות חולקות צומת אחד (קשתות נוספות ב-shared_edges)
+    mode: Literal["tree", "dag"] = "tree"
+
+
+class PdaTreeCursorRequest(BaseModel):
+    """
+    עץ חישוב עצל: השורש ו-levels הרמות הראשונות, והשאר לפי דרישה.
+    """
+    pda: Dict[str, Any]
+    word: str
+    levels: int = Field(default=3, ge=0, le=10)
+    max_nodes: int = Field(default=500, ge=1, le=5000)
 
 
 class PdaGenerateAndTreeSimulationRequest(BaseModel):
@@ -46,6 +83,8 @@ class PdaGenerateAndTreeSimulationRequest(BaseModel):
     word: str
     max_steps: int = 2000
     max_nodes: int = 4000
+    format: Literal["nested", "columnar"] = "nested"
+    mode: Literal["tree", "dag"] = "tree"
 
 
 # ============================================================
@@ -98,8 +137,8 @@ async def simulate_pda_endpoint(payload: PdaSimulationRequest) -> JSONResponse:
     סימולציה רגילה – מחזירה מסלול אחד (אם קיים).
     """
     try:
-        logger.info("PDA simulation requested. Word='%s'", payload.word)
-        result = await simulate_pda_word(payload.pda, payload.word)
+        logger.info("PDA simulation requested. Word='%s' (%s)", payload.word, payload.strategy)
+        result = await simulate_pda_word(payload.pda, payload.word, strategy=payload.strategy)
         return JSONResponse(result)
 
     except Exception as exc:
@@ -114,6 +153,83 @@ async def simulate_pda_endpoint(payload: PdaSimulationRequest) -> JSONResponse:
         )
 
 
+# ============================================================
+# API – Batch simulation
+# ============================================================
+
+@router.post("/pda/simulate_batch", response_class=JSONResponse, tags=["PDA"])
+async def simulate_pda_batch_endpoint(payload: PdaBatchSimulationRequest) -> JSONResponse:
+    """
+    מכריע הרבה מילים מול PDA אחד שמקומפל פעם אחת (ללא Trace).
+    """
+    try:
+        words = list(payload.words)
+        if payload.max_length is not None:
+            alphabet = payload.pda.get("input_alphabet") or []
+            words += words_up_to(alphabet, payload.max_length)
+
+        examples = (payload.pda.get("simulation_examples") or {}) if payload.include_examples else {}
+        expect_accept = list(examples.get("accepted") or [])
+        expect_reject = list(examples.get("rejected") or [])
+        base = len(words)
+        words += expect_accept + expect_reject
+
+        if not words:
+            return JSONResponse({"error": "❌ לא נמסרו מילים להרצה."}, status_code=400)
+        if len(words) > MAX_BATCH_WORDS:
+            return JSONResponse(
+                {"error": f"❌ יותר מדי מילים ({len(words)}); המגבלה היא {MAX_BATCH_WORDS}."},
+                status_code=400,
+            )
+
+        logger.info("PDA batch simulation requested. words=%d", len(words))
+        result = await run_in_threadpool(decide_pda_batch, payload.pda, words)
+
+        # אינדקסים ב-words שבהם ההכרעה סותרת את simulation_examples
+        verdicts = result["verdicts"]
+        n_acc = len(expect_accept)
+        result["mismatches"] = [
+            base + i for i in range(n_acc) if verdicts[base + i] != "accept"
+        ] + [
+            base + n_acc + i for i in range(len(expect_reject)) if verdicts[base + n_acc + i] != "reject"
+        ]
+        return JSONResponse(result)
+
+    except ValueError as exc:
+        logger.warning("PDA batch simulation rejected: %s", exc)
+        return JSONResponse({"error": f"❌ {exc}"}, status_code=400)
+    except Exception as exc:
+        logger.exception("Error while batch-simulating PDA: %s", exc)
+        return JSONResponse(
+            {"error": "❌ שגיאה בהרצת האוטומט על רשימת המילים."},
+            status_code=500,
+        )
+
+
+# ============================================================
+# API – Static analysis
+# ============================================================
+
+@router.post("/pda/analyze", response_class=JSONResponse, tags=["PDA"])
+async def analyze_pda_endpoint(payload: PdaAnalyzeRequest) -> JSONResponse:
+    """
+    מצבים לא ישיגים, מעברים שלעולם לא יופעלו, ε-closures ולולאות ε שמגדילות את המחסנית.
+    """
+    try:
+        result = await run_in_threadpool(analyze_pda, payload.pda)
+        return JSONResponse(result)
+
+    except ValueError as exc:
+        logger.warning("PDA analysis rejected: %s", exc)
+        return JSONResponse({"error": f"❌ {exc}"}, status_code=400)
+    except Exception as exc:
+        logger.exception("Error while analyzing PDA: %s", exc)
+        return JSONResponse(
+            {"error": "❌ שגיאה בניתוח האוטומט."},
+            status_code=500,
+        )
+
+
 # ============================================================
 # API – Simulation with computation tree (NPDA)
 # ============================================================
@@ -135,6 +251,8 @@ async def simulate_pda_tree_endpoint(
             input_word=payload.word,
             max_steps=payload.max_steps,
             max_nodes=payload.max_nodes,
+            format=payload.format,
+            mode=payload.mode,
         )
 
         return JSONResponse(result)
@@ -151,6 +269,66 @@ async def simulate_pda_tree_endpoint(
         )
 
 
+# ============================================================
+# API – Lazy computation tree (cursor)
+# ============================================================
+
+@router.post("/pda/tree", response_class=JSONResponse, tags=["PDA"])
+async def open_pda_tree_endpoint(payload: PdaTreeCursorRequest) -> JSONResponse:
+    """
+    פותח עץ חישוב עצל ומחזיר handle + השורש ו-levels הרמות הראשונות.
+    """
+    try:
+        logger.info("NPDA lazy tree requested. Word='%s'", payload.word)
+        result = await run_in_threadpool(
+            open_tree, payload.pda, payload.word, levels=payload.levels, max_nodes=payload.max_nodes
+        )
+        return JSONResponse(result)
+
+    except ValueError as exc:
+        return JSONResponse({"tree": {}, "error": f"❌ {exc}"}, status_code=400)
+    except Exception as exc:
+        logger.exception("Error while opening NPDA tree: %s", exc)
+        return JSONResponse(
+            {"tree": {}, "error": "❌ שגיאה בבניית עץ החישוב."},
+            status_code=500,
+        )
+
+
+@router.post("/pda/tree/{handle}/expand/{node_id}", response_class=JSONResponse, tags=["PDA"])
+async def expand_pda_tree_endpoint(
+    handle: str,
+    node_id: int,
+    levels: int = Query(default=1, ge=1, le=10),
+    max_nodes: int = Query(default=500, ge=1, le=5000),
+) -> JSONResponse:
+    """
+    מרחיב צומת בעץ העצל (ילדים לפי דרישה) ומחזיר רק את הצמתים שנגעו בהם.
+    """
+    try:
+        result = await run_in_threadpool(expand_tree, handle, node_id, levels=levels, max_nodes=max_nodes)
+        if result is None:
+            return JSONResponse(
+                {"tree": {}, "error": "❌ העץ פג תוקף או לא נמצא.", "expired": True},
+                status_code=404,
+            )
+        return JSONResponse(result)
+
+    except ValueError as exc:
+        return JSONResponse({"tree": {}, "error": f"❌ {exc}"}, status_code=400)
+    except Exception as exc:
+        logger.exception("Error while expanding NPDA tree: %s", exc)
+        return JSONResponse(
+            {"tree": {}, "error": "❌ שגיאה בהרחבת עץ החישוב."},
+            status_code=500,
+        )
+
+
+@router.delete("/pda/tree/{handle}", response_class=JSONResponse, tags=["PDA"])
+async def close_pda_tree_endpoint(handle: str) -> JSONResponse:
+    return JSONResponse({"closed": close_tree(handle)})
+
+
 # ============================================================
 # API – Generate + Tree Simulation
 # ============================================================
@@ -188,6 +366,8 @@ async def generate_and_simulate_pda_tree_endpoint(
             input_word=payload.word,
             max_steps=payload.max_steps,
             max_nodes=payload.max_nodes,
+            format=payload.format,
+            mode=payload.mode,
         )
 
         return JSONResponse(
@@ -1,20 +1,37 @@
 # routers/tm_router.py
+import json
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from services.tm_service import generate_tm_from_nl
 from services.tm_simulator import (
     init_config,
+    tape_from_config,
     snapshot_window,
     step_tm,
     run_tm,
+    run_tm_batch,
+    trace_window,
     TMSpecError,
 )
+from services.ntm_engine import run_ntm
+from services.tm_language_library import (
+    get_compiled_language,
+    list_compiled_languages,
+)
+from services.tm_session_service import (
+    get_compiled,
+    create_session,
+    step_session,
+    close_session,
+    session_stats,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,18 +49,65 @@ class InitRequest(BaseModel):
     spec: Dict[str, Any]
     input_str: str = ""
     window_radius: int = Field(default=12, ge=3, le=40)
+    session: bool = False  # opt-in: keep the compiled machine + tape on the server
 
 
 class StepRequest(BaseModel):
+    # stateless mode: spec+config; session mode: session_id only
+    spec: Optional[Dict[str, Any]] = None
+    config: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None
+    window_radius: int = Field(default=12, ge=3, le=40)
+
+
+# full per-step traces stay on the old ceiling; delta/none traces use the compiled loop
+TRACE_MAX_STEPS = 5000
+
+
+class RunOptions(BaseModel):
+    input_str: str = ""
+    max_steps: int = Field(default=300, ge=1, le=200_000)
+    window_radius: int = Field(default=12, ge=3, le=40)
+    trace_mode: Literal["full", "delta", "none"] = "full"
+    keyframe_every: int = Field(default=256, ge=1, le=100_000)
+    detect_loops: bool = False
+
+
+class RunRequest(RunOptions):
     spec: Dict[str, Any]
-    config: Dict[str, Any]
+
+
+class RunStreamRequest(BaseModel):
+    spec: Dict[str, Any]
+    input_str: str = ""
+    # frames are produced lazily, so the step budget is not bounded by trace memory
+    max_steps: int = Field(default=5000, ge=1, le=5_000_000)
+    every: int = Field(default=1, ge=1, le=100_000)  # emit every k-th step
     window_radius: int = Field(default=12, ge=3, le=40)
+    format: Literal["ndjson", "sse"] = "ndjson"
+
+
+class RunBatchRequest(BaseModel):
+    spec: Dict[str, Any]
+    words: List[str] = Field(default_factory=list, max_length=5000)
+    # optional expectations (e.g. TMLanguage.examples_accept/examples_reject or spec["examples"])
+    expect_accept: List[str] = Field(default_factory=list, max_length=5000)
+    expect_reject: List[str] = Field(default_factory=list, max_length=5000)
+    max_steps: int = Field(default=5000, ge=1, le=200_000)  # per word
+    detect_loops: bool = True
 
 
-class RunRequest(BaseModel):
+class NTMRunRequest(BaseModel):
     spec: Dict[str, Any]
     input_str: str = ""
-    max_steps: int = Field(default=300, ge=1, le=5000)
+    max_steps: int = Field(default=500, ge=1, le=20_000)  # depth of a branch
+    max_nodes: int = Field(default=20_000, ge=1, le=500_000)  # configurations created
+    window_radius: int = Field(default=12, ge=3, le=40)
+
+
+class TraceWindowRequest(BaseModel):
+    trace: Dict[str, Any]
+    step: int = Field(ge=0)
     window_radius: int = Field(default=12, ge=3, le=40)
 
 
@@ -96,13 +160,24 @@ async def tm_init(payload: InitRequest):
             start_state=start_state,
         )
 
+        if payload.session:
+            session_id, session = create_session(payload.spec, payload.input_str)
+            res = {
+                "ok": True,
+                "session_id": session_id,
+                "config": session.machine.config_of(session.run),
+                "window": session.machine.window_of(session.run, payload.window_radius),
+            }
+            if session.machine.k > 1:
+                res["windows"] = session.machine.windows_of(session.run, payload.window_radius)
+            return res
+
         return {
             "ok": True,
             "config": config,
             "window": snapshot_window(
-                tape=config["tape"],
+                tape=tape_from_config(config, [blank]),
                 head=config["head"],
-                blank=blank,
                 radius=payload.window_radius,
             ),
         }
@@ -116,12 +191,24 @@ async def tm_init(payload: InitRequest):
 
 
 @router.post("/step")
-async def tm_step(payload: StepRequest):
+async def tm_step(payload: StepRequest, n: int = Query(default=1, ge=1, le=10_000)):
     """
-    One step simulation (stateless; client holds config).
+    Step simulation.
+    - session mode (session_id): advances n steps in place, returns only state/head/step + window.
+    - stateless mode (spec+config): client holds config and gets the updated one back.
     """
     try:
-        res = step_tm(payload.spec, payload.config, window_radius=payload.window_radius)
+        if payload.session_id:
+            try:
+                res = step_session(payload.session_id, n=n, window_radius=payload.window_radius)
+            except TMSpecError as e:
+                return {"ok": False, "message": str(e), "session_expired": True}
+            return {"ok": True, "session_id": payload.session_id, **res}
+
+        if payload.spec is None or payload.config is None:
+            return {"ok": False, "message": "spec and config are required without session_id"}
+
+        res = step_tm(payload.spec, payload.config, window_radius=payload.window_radius, n=n)
         return {"ok": True, **res}
     except TMSpecError as e:
         logger.warning("TM step failed: %s", e)
@@ -131,17 +218,37 @@ async def tm_step(payload: StepRequest):
         return {"ok": False, "message": "שגיאה לא צפויה בצעד"}
 
 
+@router.delete("/session/{session_id}")
+async def tm_session_close(session_id: str):
+    """
+    Release a server-side session early (otherwise it expires by TTL/LRU).
+    """
+    return {"ok": close_session(session_id)}
+
+
+@router.get("/session/stats")
+async def tm_session_stats():
+    return {"ok": True, **session_stats()}
+
+
 @router.post("/run")
 async def tm_run(payload: RunRequest):
     """
     Full run (returns trace) - optional.
     """
+    if payload.trace_mode == "full" and payload.max_steps > TRACE_MAX_STEPS:
+        return {"ok": False, "message": f"max_steps > {TRACE_MAX_STEPS} requires trace_mode 'delta' or 'none'"}
+
     try:
-        res = run_tm(
+        res = await run_in_threadpool(
+            run_tm,
             spec=payload.spec,
             input_str=payload.input_str,
             max_steps=payload.max_steps,
             window_radius=payload.window_radius,
+            trace_mode=payload.trace_mode,
+            keyframe_every=payload.keyframe_every,
+            detect_loops=payload.detect_loops,
         )
         return {"ok": True, **res}
     except TMSpecError as e:
@@ -150,3 +257,169 @@ async def tm_run(payload: RunRequest):
     except Exception:
         logger.exception("Unexpected TM run error")
         return {"ok": False, "message": "שגיאה לא צפויה בהרצה"}
+
+
+@router.post("/run/stream")
+async def tm_run_stream(payload: RunStreamRequest, request: Request):
+    """
+    Streams the run as NDJSON lines or SSE events, one frame every `every` steps.
+    Frames are computed one at a time and only after the previous one was sent,
+    and the run stops as soon as the client disconnects.
+    """
+    try:
+        machine = get_compiled(payload.spec)
+    except TMSpecError as e:
+        logger.warning("TM stream failed: %s", e)
+        return {"ok": False, "message": str(e)}
+    except Exception:
+        logger.exception("Unexpected TM stream error")
+        return {"ok": False, "message": "שגיאה לא צפויה בהרצה"}
+
+    frames = machine.stream(
+        payload.input_str,
+        max_steps=payload.max_steps,
+        every=payload.every,
+        window_radius=payload.window_radius,
+    )
+    sse = payload.format == "sse"
+
+    def encode(frame: Dict[str, Any]) -> str:
+        body = json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+        return f"data: {body}\n\n" if sse else body + "\n"
+
+    async def body():
+        while True:
+            if await request.is_disconnected():
+                logger.info("TM stream client disconnected")
+                return
+            try:
+                # the simulation chunk runs off the event loop
+                frame = await run_in_threadpool(next, frames, None)
+            except Exception:
+                logger.exception("Unexpected TM stream error")
+                yield encode({"ok": False, "message": "שגיאה לא צפויה בהרצה"})
+                return
+            if frame is None:
+                return
+            yield encode(frame)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/library")
+async def tm_library():
+    """
+    Built-in languages with their validation status and example verdicts (precompiled at startup).
+    """
+    return {"ok": True, "languages": list_compiled_languages()}
+
+
+@router.post("/library/{language_id}/run")
+async def tm_library_run(language_id: str, payload: RunOptions):
+    """
+    Run a built-in machine; the spec is already compiled, so nothing is parsed or validated here.
+    """
+    if payload.trace_mode == "full" and payload.max_steps > TRACE_MAX_STEPS:
+        return {"ok": False, "message": f"max_steps > {TRACE_MAX_STEPS} requires trace_mode 'delta' or 'none'"}
+
+    try:
+        compiled = get_compiled_language(language_id)
+    except ValueError as e:
+        return {"ok": False, "message": str(e)}
+    if not compiled.valid:
+        return {"ok": False, "message": compiled.error}
+
+    try:
+        res = await run_in_threadpool(
+            compiled.machine.run,
+            input_str=payload.input_str,
+            max_steps=payload.max_steps,
+            window_radius=payload.window_radius,
+            trace_mode=payload.trace_mode,
+            keyframe_every=payload.keyframe_every,
+            detect_loops=payload.detect_loops,
+        )
+        return {"ok": True, "language_id": language_id, **res}
+    except TMSpecError as e:
+        logger.warning("TM library run failed: %s", e)
+        return {"ok": False, "message": str(e)}
+    except Exception:
+        logger.exception("Unexpected TM library run error")
+        return {"ok": False, "message": "שגיאה לא צפויה בהרצה"}
+
+
+@router.post("/run_batch")
+async def tm_run_batch(payload: RunBatchRequest):
+    """
+    Decide many words against one compiled machine (no traces).
+    Words from expect_accept/expect_reject are appended to `words` and checked.
+    """
+    words = payload.words + payload.expect_accept + payload.expect_reject
+    if not words:
+        return {"ok": False, "message": "no words given"}
+
+    try:
+        res = await run_in_threadpool(
+            run_tm_batch,
+            payload.spec,
+            words,
+            max_steps=payload.max_steps,
+            detect_loops=payload.detect_loops,
+        )
+    except TMSpecError as e:
+        logger.warning("TM batch run failed: %s", e)
+        return {"ok": False, "message": str(e)}
+    except Exception:
+        logger.exception("Unexpected TM batch run error")
+        return {"ok": False, "message": "שגיאה לא צפויה בהרצה מרובה"}
+
+    # indices into `words` whose verdict contradicts the expectation
+    base = len(payload.words)
+    n_acc = len(payload.expect_accept)
+    verdicts = res["verdicts"]
+    mismatches = [
+        base + i for i in range(n_acc) if verdicts[base + i] != "accept"
+    ] + [
+        base + n_acc + i for i in range(len(payload.expect_reject)) if verdicts[base + n_acc + i] == "accept"
+    ]
+    return {"ok": True, **res, "mismatches": mismatches}
+
+
+@router.post("/ntm/run")
+async def tm_ntm_run(payload: NTMRunRequest):
+    """
+    Nondeterministic run: BFS over configurations, returns the verdict and the accepting branch.
+    """
+    try:
+        res = await run_in_threadpool(
+            run_ntm,
+            payload.spec,
+            payload.input_str,
+            max_steps=payload.max_steps,
+            max_nodes=payload.max_nodes,
+            window_radius=payload.window_radius,
+        )
+        return {"ok": True, **res}
+    except TMSpecError as e:
+        logger.warning("NTM run failed: %s", e)
+        return {"ok": False, "message": str(e)}
+    except Exception:
+        logger.exception("Unexpected NTM run error")
+        return {"ok": False, "message": "שגיאה לא צפויה בהרצה הלא-דטרמיניסטית"}
+
+
+@router.post("/trace/window")
+async def tm_trace_window(payload: TraceWindowRequest):
+    """
+    Rebuild one step's config+window from a delta trace returned by /tm/run.
+    """
+    try:
+        res = await run_in_threadpool(trace_window, payload.trace, payload.step, window_radius=payload.window_radius)
+        return {"ok": True, **res}
+    except TMSpecError as e:
+        logger.warning("TM trace window failed: %s", e)
+        return {"ok": False, "message": str(e)}
+    except Exception:
+        logger.exception("Unexpected TM trace window error")
+        return {"ok": False, "message": "שגיאה לא צפויה בשחזור חלון"}
@@ -1,11 +1,15 @@
 import os
 import json
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from openai import OpenAI
 from services.language_spec_service import check_language_regularity
 
 from services.language_spec_service import build_language_spec
 from services.dfa_validator import validate_dfa_against_spec
+from services.dfa_minimizer import dfa_equivalence, minimize_dfa
+from services.dfa_fast_path import fast_path_dfa
+from services.pipeline_cache import pipeline_cache
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -226,6 +230,23 @@ async def generate_automaton_html(description: str) -> JSONResponse:
     print("\n========== New Automaton Request ==========")
     print("[Input]", description)
 
+    # ====================================================
+    # ⚡ מסלול מהיר – regex / תבנית מוכרת, בלי קריאה למודל
+    # ====================================================
+    # subset construction is CPU-bound, so it runs in the threadpool
+    fast = await run_in_threadpool(fast_path_dfa, description)
+    if fast is not None:
+        print("[Fast Path]", fast["source"])
+        return JSONResponse(fast)
+
+    # ====================================================
+    # 💾 אותו תיאור כבר נבנה (גם לפני restart) – DFA מאומת מה-cache
+    # ====================================================
+    cached = pipeline_cache.get("dfa", description)
+    if cached is not None:
+        print("[Cache Hit]", cached.get("status"))
+        return JSONResponse(cached)
+
     # ====================================================
     # 0️⃣ בדיקת רגולריות – דרך ה־API (שלב חדש!)
     # ====================================================
@@ -253,8 +274,8 @@ async def generate_automaton_html(description: str) -> JSONResponse:
     # ====================================================
     # 2️⃣ בניית DFA ראשוני
     # ====================================================
-    dfa = build_dfa_from_spec(spec)
-    print("[DFA Built]")
+    dfa = minimize_dfa(build_dfa_from_spec(spec))
+    print("[DFA Built]", dfa["minimization"])
 
     # ====================================================
     # 3️⃣ אימות (רך)
@@ -270,32 +291,43 @@ async def generate_automaton_html(description: str) -> JSONResponse:
         dfa["accuracy"] = score
         dfa["status"] = "high_confidence"
         dfa["warnings"] = []
+        pipeline_cache.put("dfa", description, dfa)
         return JSONResponse(dfa)
 
-    # 🟡 אוטומט סביר – מציגים עם אזהרות
-    if score >= DISPLAY_THRESHOLD:
-        dfa["source"] = "model"
-        dfa["accuracy"] = score
-        dfa["status"] = "approximate"
-        dfa["warnings"] = validation.get("errors", [])
-        return JSONResponse(dfa)
-
-    # 🔵 ניסיון Repair (רשות)
-    if score >= REPAIR_THRESHOLD:
+    # 🔵 ניסיון Repair – קרוב למושלם, עם שגיאות ידועות שאפשר לתקן
+    if REPAIR_THRESHOLD <= score < STRICT_THRESHOLD:
         print("[Repair Attempt]")
-        repaired = repair_dfa(description, spec, dfa, validation.get("errors", []))
-        validation2 = validate_dfa_against_spec(repaired, spec)
-        print("[Re-Validation Result]", validation2)
+        repaired = minimize_dfa(repair_dfa(description, spec, dfa, validation.get("errors", [])))
+
+        # Repair שלא שינה את השפה – אין טעם לאמת שוב
+        if dfa_equivalence(dfa, repaired)["equivalent"]:
+            print("[Repair] language unchanged – skipping re-validation")
+            validation2 = validation
+        else:
+            validation2 = validate_dfa_against_spec(repaired, spec)
+            print("[Re-Validation Result]", validation2)
 
         score2 = validation2.get("score", 0)
 
-        if score2 >= DISPLAY_THRESHOLD:
+        # מחליפים רק אם ה-Repair באמת שיפר
+        if score2 > score:
             repaired["source"] = "repaired"
             repaired["accuracy"] = score2
-            repaired["status"] = "approximate"
+            repaired["status"] = "high_confidence" if score2 >= STRICT_THRESHOLD else "approximate"
             repaired["warnings"] = validation2.get("errors", [])
+            if score2 >= STRICT_THRESHOLD:
+                pipeline_cache.put("dfa", description, repaired)
             return JSONResponse(repaired)
 
+    # 🟡 אוטומט סביר – מציגים עם אזהרות
+    if score >= DISPLAY_THRESHOLD:
+        dfa["source"] = "model"
+        dfa["accuracy"] = score
+        dfa["status"] = "approximate"
+        dfa["warnings"] = validation.get("errors", [])
+        # לא נשמר ב-cache: ניסיון חוזר עשוי להניב אוטומט טוב יותר
+        return JSONResponse(dfa)
+
     # 🔴 איכות נמוכה – עדיין מציגים (מדיניות מוצר)
     dfa["source"] = "low_confidence"
     dfa["accuracy"] = score
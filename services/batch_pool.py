@@ -0,0 +1,65 @@
+# services/batch_pool.py
+"""
+One process pool shared by the batch deciders (run_tm_batch, decide_pda_batch).
+
+The pool is sized by the server (BATCH_POOL_WORKERS), never by a request, and is
+created on first use with the "spawn" start method, so worker processes are not
+forked from the multithreaded server. BATCH_POOL_WORKERS=1 disables it.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BATCH_POOL_WORKERS = int(os.getenv("BATCH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# below this many words a process pool costs more than it saves
+BATCH_POOL_MIN_WORDS = int(os.getenv("BATCH_POOL_MIN_WORDS", "64"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=BATCH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info("Batch process pool started with %d workers.", BATCH_POOL_WORKERS)
+        return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def map_chunks(fn: Callable[..., List[Any]], machine: Any, words: List[str], *args: Any) -> List[Any]:
+    """
+    fn(machine, chunk, *args) over contiguous chunks of words, results concatenated
+    in order. Small batches (or a disabled pool) run in the calling thread; a
+    broken pool is discarded and the batch is decided in the calling thread.
+    """
+    if BATCH_POOL_WORKERS <= 1 or len(words) < BATCH_POOL_MIN_WORDS:
+        return fn(machine, words, *args)
+
+    size = -(-len(words) // BATCH_POOL_WORKERS)
+    chunks = [words[i:i + size] for i in range(0, len(words), size)]
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(fn, machine, chunk, *args) for chunk in chunks]
+        return [r for future in futures for r in future.result()]
+    except BrokenProcessPool:
+        logger.warning("Batch process pool broke; deciding the batch in-process.")
+        _drop_pool(pool)
+        return fn(machine, words, *args)
@@ -0,0 +1,169 @@
+# services/dfa_compiled.py
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledDFA:
+    """
+    DFA (in the validate_and_fix_dfa format) with states and symbols interned to
+    ints, a NumPy transition matrix and an accept mask.
+
+    Columns 0..k-1 are the alphabet symbols; two extra columns make batches
+    branch-free: PAD (every state loops to itself, used to right-pad shorter
+    words) and UNKNOWN (a character outside the alphabet, goes to the dead
+    state). Row `dead` is a rejecting sink, also the target of missing
+    transitions. Targets that are not listed in "states" are added as
+    (rejecting) states, the way validate_and_fix_dfa turns them into sinks.
+    """
+
+    def __init__(self, dfa: Dict[str, Any]):
+        self.states: List[str] = list(dict.fromkeys(dfa.get("states", [])))
+        self.state_ids: Dict[str, int] = {s: i for i, s in enumerate(self.states)}
+        # run_dfa reads one character at a time, so only 1-char symbols can ever match
+        self.symbols: List[str] = [s for s in dict.fromkeys(dfa.get("alphabet", [])) if len(s) == 1]
+        self.symbol_ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+
+        self.start: int = self._state(dfa["start_state"])
+        edges = []
+        for frm, row in (dfa.get("transitions") or {}).items():
+            for sym, to in (row or {}).items():
+                if sym in self.symbol_ids:
+                    edges.append((self._state(frm), self.symbol_ids[sym], self._state(to)))
+
+        k = len(self.symbols)
+        self.PAD = k
+        self.UNKNOWN = k + 1
+        self.dead = len(self.states)
+
+        delta = np.full((self.dead + 1, k + 2), self.dead, dtype=np.int32)
+        delta[:, self.PAD] = np.arange(self.dead + 1, dtype=np.int32)
+        for frm, sym, to in edges:
+            delta[frm, sym] = to
+        self.delta = delta
+        # cells that had no transition (as opposed to the UNKNOWN/PAD columns and the dead row),
+        # for callers that must fail on them the way a dict walk would
+        self.missing = np.zeros_like(delta, dtype=bool)
+        self.missing[: self.dead, :k] = True
+        for frm, sym, _ in edges:
+            self.missing[frm, sym] = False
+        self.partial = bool(self.missing.any())
+
+        accept_states = set(dfa.get("accept_states", []))
+        self.accept = np.zeros(self.dead + 1, dtype=bool)
+        for name in accept_states:
+            if name in self.state_ids:
+                self.accept[self.state_ids[name]] = True
+
+        # character code points (sorted) -> column, for vectorized encoding
+        order = sorted(range(k), key=lambda i: ord(self.symbols[i]))
+        self._codes = np.array([ord(self.symbols[i]) for i in order], dtype=np.uint32)
+        self._code_cols = np.array(order, dtype=np.int32)
+        # plain lists for the single-word path, where NumPy indexing costs more than it saves
+        self._rows: List[List[int]] = delta.tolist()
+        self._accept_list: List[bool] = self.accept.tolist()
+
+    def _state(self, name: str) -> int:
+        sid = self.state_ids.get(name)
+        if sid is None:
+            sid = len(self.states)
+            self.states.append(name)
+            self.state_ids[name] = sid
+        return sid
+
+    # --------------------------------------------------------
+    # running
+    # --------------------------------------------------------
+
+    def accepts(self, word: str) -> bool:
+        rows = self._rows
+        ids = self.symbol_ids
+        unknown = self.UNKNOWN
+        current = self.start
+        for ch in word:
+            current = rows[current][ids.get(ch, unknown)]
+        return self._accept_list[current]
+
+    def encode(self, words: List[str]) -> np.ndarray:
+        """
+        (len(words), max length) matrix of column ids, right-padded with PAD.
+        """
+        lengths = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+        width = int(lengths.max()) if len(words) else 0
+        cols = np.full((len(words), width), self.PAD, dtype=np.int32)
+        if width:
+            codes = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+            # row-major order of the mask is exactly the order of the joined characters
+            cols[np.arange(width) < lengths[:, None]] = self._columns(codes)
+        return cols
+
+    def run_batch(self, words: List[str], strict: bool = False) -> np.ndarray:
+        """
+        Runs all words at once: one gather over the transition matrix per position.
+        Returns a bool array parallel to words. With strict=True a word that
+        reaches a missing transition raises KeyError instead of being rejected.
+        """
+        cols = self.encode(words)
+        current = np.full(len(words), self.start, dtype=np.int32)
+        delta = self.delta
+        check = strict and self.partial
+        hit = np.zeros(len(words), dtype=bool)
+        for j in range(cols.shape[1]):
+            if check:
+                hit |= self.missing[current, cols[:, j]]
+            current = delta[current, cols[:, j]]
+        if hit.any():
+            i = int(np.argmax(hit))
+            raise KeyError(f"missing transition while reading {words[i]!r}")
+        return self.accept[current]
+
+    def _columns(self, codes: np.ndarray) -> np.ndarray:
+        if not len(self._codes):
+            return np.full(len(codes), self.UNKNOWN, dtype=np.int32)
+        idx = np.minimum(np.searchsorted(self._codes, codes), len(self._codes) - 1)
+        return np.where(self._codes[idx] == codes, self._code_cols[idx], self.UNKNOWN).astype(np.int32)
+
+
+# ------------------------------------------------------------
+# Cache
+# ------------------------------------------------------------
+
+# only these fields affect the automaton (explanations, accuracy etc. are ignored)
+_SPEC_FIELDS = ("alphabet", "states", "start_state", "accept_states", "transitions")
+
+_compiled: SessionStore[CompiledDFA] = SessionStore(
+    max_entries=256,
+    ttl_seconds=1800,
+    max_bytes=32 * 1024 * 1024,
+    sizeof=lambda m: 1024 + m.delta.nbytes + 64 * len(m.states),
+)
+
+
+def dfa_spec_key(dfa: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {k: dfa.get(k) for k in _SPEC_FIELDS},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_compiled_dfa(dfa: Dict[str, Any]) -> CompiledDFA:
+    """
+    Compiles a DFA once per distinct spec (keyed by a hash of its fields).
+    """
+    key = dfa_spec_key(dfa)
+    machine = _compiled.get(key)
+    if machine is None:
+        machine = CompiledDFA(dfa)
+        _compiled.put(machine, key=key)
+    return machine
@@ -0,0 +1,283 @@
+# services/dfa_fast_path.py
+"""
+Deterministic fast path for generate_automaton_html: descriptions that are
+really a regular expression, or one of a few common templates ("ends with",
+"contains", "length mod k", "number of 1s mod k"...), are compiled locally
+(Thompson NFA → subset construction → Hopcroft) without calling the model.
+fast_path_dfa returns None for anything it does not recognise.
+"""
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.dfa_minimizer import minimize_dfa
+from services.regex_compiler import RegexError, compile_regex
+
+logger = logging.getLogger(__name__)
+
+# characters a bare regex may consist of (symbols are letters/digits)
+_REGEX_CHARS = re.compile(r"^[A-Za-z0-9()|*+?.\[\]ε\s]+$")
+# operators that make text a regex on their own; "?" and "." also end ordinary sentences
+_REGEX_STRUCTURE = set("()|*+[")
+_REGEX_PREFIXES = ("regex:", "ביטוי רגולרי:")
+_ALPHABET_SET = re.compile(r"\{\s*([^}]*)\}")
+# "(a|b)*ab over {a,b}" / "... מעל {a,b}"
+_REGEX_ALPHABET = re.compile(r"^(.*?)\s*(?:over|מעל)\s*\{\s*([^}]*)\}$", re.IGNORECASE)
+
+# optional lead-in before the property: "all binary strings over {a,b} that ..." / "כל המילים מעל {a,b} ש..."
+_LEAD = (
+    r"(?:the )?(?:language of )?(?:all )?(?:binary )?(?:strings|words)?\s*"
+    r"(?:over (?:the alphabet )?\{[^}]*\}\s*)?(?:that |which |whose |with |where )?"
+    r"(?:כל )?(?:ה)?(?:מילים|מחרוזות)?\s*(?:מעל \{[^}]*\}\s*)?(?:ש|אשר |עם )?"
+)
+# "length mod k" templates build k states
+_MAX_MODULUS = 1000
+_PARITY = {"even": (2, 0), "odd": (2, 1), "זוגי": (2, 0), "אי-זוגי": (2, 1), "אי זוגי": (2, 1)}
+
+
+def fast_path_dfa(description: str) -> Optional[Dict[str, Any]]:
+    """
+    DFA מינימלי לתיאור שהוא regex או תבנית מוכרת, או None (ואז ממשיכים למודל).
+    """
+    # case is kept: symbols are case-sensitive ({A,B} is not {a,b})
+    text = " ".join(description.split())
+    if not text:
+        return None
+    try:
+        dfa = _from_regex(text)
+        if dfa is None:
+            dfa = _from_template(text.rstrip("."))
+    except RegexError:
+        return None
+    if dfa is None:
+        return None
+
+    dfa = minimize_dfa(dfa)
+    dfa.update({"accuracy": 100, "status": "high_confidence", "warnings": [], "simulation": {}})
+    logger.info("DFA fast path (%s) for '%s': %d states.", dfa["source"], description, len(dfa["states"]))
+    return dfa
+
+
+# ------------------------------------------------------------
+# Regex input
+# ------------------------------------------------------------
+
+def _from_regex(text: str) -> Optional[Dict[str, Any]]:
+    prefixed = False
+    for prefix in _REGEX_PREFIXES:
+        if text.lower().startswith(prefix):
+            text = text[len(prefix):].strip()
+            prefixed = True
+            break
+    if not prefixed:
+        # a sentence-final "." is punctuation, not "any symbol"
+        text = text[:-1].rstrip() if text.endswith(".") else text
+    alphabet: Optional[List[str]] = None
+    explicit = _REGEX_ALPHABET.match(text)
+    if explicit:
+        text = explicit.group(1)
+        alphabet = [s for s in re.split(r"[,\s]+", explicit.group(2)) if s]
+        if not alphabet or any(len(s) != 1 for s in alphabet):
+            return None
+    if len(text) > 1 and text[0] == "/" and text[-1] == "/":
+        text = text[1:-1]
+        prefixed = True
+    if not _REGEX_CHARS.match(text):
+        return None
+    # textbook regexes write union as "+" ((0+1)*01); only read it as one-or-more when
+    # the writer marked the text as a regex
+    if "+" in text and not prefixed:
+        return None
+    # a regex needs real structure, or the writer must have said it is one
+    if not (_REGEX_STRUCTURE & set(text) or prefixed or explicit):
+        return None
+    if re.search(r"[A-Za-z0-9]\s+[A-Za-z0-9]", text):
+        return None
+    # plain words ("even", "binary") are not regexes: require every letter run to be short
+    if any(len(run) > 4 for run in re.findall(r"[A-Za-z]+", text)):
+        return None
+    # nor are short words between regex pieces ("(ab)* or (ba)*", "(a|b)* not (ab)"),
+    # unless the writer said it is a regex
+    if not (prefixed or explicit) and re.search(r"\s[A-Za-z]{2,}|[A-Za-z]{2,}\s", text):
+        return None
+
+    if alphabet is None:
+        alphabet = _alphabet_for(sorted({ch for ch in text if ch.isalnum() and ch != "ε"}))
+        if alphabet is None:
+            return None
+    dfa = compile_regex(text, alphabet)
+    explanation = f"האוטומט מקבל בדיוק את המילים שמתאימות לביטוי הרגולרי {text}."
+    if "+" in text:
+        explanation += " הסימן + נקרא כ\"אחד או יותר\" ולא כאיחוד; לאיחוד יש לכתוב |."
+    dfa.update(
+        {
+            "explanation": explanation,
+            "logic": "הביטוי קומפל ל-NFA (בנייה של Thompson), הומר ל-DFA בבניית תת-קבוצות ומוזער.",
+            "source": "regex",
+        }
+    )
+    return dfa
+
+
+# ------------------------------------------------------------
+# Templates
+# ------------------------------------------------------------
+
+def _ends_with(alphabet: List[str], word: str) -> Dict[str, Any]:
+    return _with_text(
+        compile_regex(f"(.)*{word}", alphabet),
+        f"האוטומט מקבל מילים שמסתיימות ב-{word}.",
+        f"המצבים זוכרים את הרישא הארוכה ביותר של {word} שהיא סיפא של מה שנקרא עד כה.",
+    )
+
+
+def _starts_with(alphabet: List[str], word: str) -> Dict[str, Any]:
+    return _with_text(
+        compile_regex(f"{word}(.)*", alphabet),
+        f"האוטומט מקבל מילים שמתחילות ב-{word}.",
+        f"המצבים סופרים כמה תווים של {word} כבר נקראו; סטייה מובילה למצב מלכודת.",
+    )
+
+
+def _contains(alphabet: List[str], word: str) -> Dict[str, Any]:
+    return _with_text(
+        compile_regex(f"(.)*{word}(.)*", alphabet),
+        f"האוטומט מקבל מילים שמכילות את תת-המחרוזת {word}.",
+        f"המצבים זוכרים את ההתקדמות בזיהוי {word}; אחרי זיהוי מלא נשארים במצב מקבל.",
+    )
+
+
+def _not_contains(alphabet: List[str], word: str) -> Dict[str, Any]:
+    dfa = _complement(compile_regex(f"(.)*{word}(.)*", alphabet))
+    return _with_text(
+        dfa,
+        f"האוטומט מקבל מילים שאינן מכילות את תת-המחרוזת {word}.",
+        f"המשלים של האוטומט שמזהה את {word}: מצב הזיהוי המלא הוא מלכודת דוחה.",
+    )
+
+
+def _length_mod(alphabet: List[str], k: int, r: int) -> Dict[str, Any]:
+    return _with_text(
+        _mod_counter(alphabet, k, r, counts=set(alphabet)),
+        f"האוטומט מקבל מילים שאורכן שקול ל-{r} מודולו {k}." + _empty_note(k, r),
+        f"מצב q_i פירושו: האורך עד כה שקול ל-i מודולו {k}; כל תו מקדם את המונה.",
+    )
+
+
+def _count_mod(alphabet: List[str], symbol: str, k: int, r: int) -> Dict[str, Any]:
+    return _with_text(
+        _mod_counter(alphabet, k, r, counts={symbol}),
+        f"האוטומט מקבל מילים שבהן מספר המופעים של {symbol} שקול ל-{r} מודולו {k}." + _empty_note(k, r),
+        f"מצב q_i פירושו: מספר ה-{symbol} עד כה שקול ל-i מודולו {k}; שאר התווים לא משנים מצב.",
+    )
+
+
+# (pattern matched after _LEAD, builder(alphabet, match) -> DFA, symbols the match uses)
+_TEMPLATES: List[Tuple[str, Callable[..., Dict[str, Any]], Callable[..., str]]] = [
+    (r"(?:ends? with|מסתיימות ב-?|מסתיימת ב-?)\s*['\"]?([a-z0-9]+)['\"]?",
+     lambda al, m: _ends_with(al, m.group(1)), lambda m: m.group(1)),
+    (r"(?:starts? with|begins? with|מתחילות ב-?|מתחילה ב-?)\s*['\"]?([a-z0-9]+)['\"]?",
+     lambda al, m: _starts_with(al, m.group(1)), lambda m: m.group(1)),
+    (r"(?:do(?:es)? not contain|don't contain|doesn't contain|אינן מכילות|לא מכילות|אינה מכילה|לא מכילה)"
+     r"\s*(?:the )?(?:substring )?(?:את )?(?:תת-המחרוזת )?['\"]?([a-z0-9]+)['\"]?",
+     lambda al, m: _not_contains(al, m.group(1)), lambda m: m.group(1)),
+    (r"(?:contains?|containing|מכילות|מכילה)\s*(?:the )?(?:substring )?(?:את )?(?:תת-המחרוזת )?['\"]?([a-z0-9]+)['\"]?",
+     lambda al, m: _contains(al, m.group(1)), lambda m: m.group(1)),
+    (r"(?:(?:an? )?(even|odd) length|length (?:is )?(even|odd)|(?:ב)?אורך (זוגי|אי-זוגי|אי זוגי)|אורכן (זוגי|אי-זוגי|אי זוגי))",
+     lambda al, m: _length_mod(al, *_PARITY[next(g for g in m.groups() if g).lower()]), lambda m: ""),
+    (r"(?:length (?:is )?(?:divisible by|a multiple of) |אורכן מתחלק ב-?|האורך מתחלק ב-?)(\d+)",
+     lambda al, m: _length_mod(al, int(m.group(1)), 0), lambda m: ""),
+    (r"length mod (\d+) (?:is |= ?|== ?)(\d+)",
+     lambda al, m: _length_mod(al, int(m.group(1)), int(m.group(2))), lambda m: ""),
+    (r"(?:an? )?(even|odd) number of ['\"]?([a-z0-9])['\"]?(?:'?s)?",
+     lambda al, m: _count_mod(al, m.group(2), *_PARITY[m.group(1).lower()]), lambda m: m.group(2)),
+    (r"(?:the )?number of ['\"]?([a-z0-9])['\"]?(?:'?s)? is (even|odd)",
+     lambda al, m: _count_mod(al, m.group(1), *_PARITY[m.group(2).lower()]), lambda m: m.group(1)),
+    (r"(?:the )?number of ['\"]?([a-z0-9])['\"]?(?:'?s)? (?:is )?(?:divisible by|a multiple of) (\d+)",
+     lambda al, m: _count_mod(al, m.group(1), int(m.group(2)), 0), lambda m: m.group(1)),
+    (r"(?:the )?number of ['\"]?([a-z0-9])['\"]?(?:'?s)? mod (\d+) (?:is |= ?|== ?)(\d+)",
+     lambda al, m: _count_mod(al, m.group(1), int(m.group(2)), int(m.group(3))), lambda m: m.group(1)),
+    (r"(?:מספר (זוגי|אי-זוגי|אי זוגי) של ה?-?([a-z0-9])|מספר ה-?([a-z0-9]) (?:בהן )?(זוגי|אי-זוגי|אי זוגי))",
+     lambda al, m: _count_mod(al, m.group(2) or m.group(3), *_PARITY[m.group(1) or m.group(4)]),
+     lambda m: m.group(2) or m.group(3)),
+]
+# keywords match in any case; the captured symbols keep theirs
+_COMPILED_TEMPLATES = [
+    (re.compile(_LEAD + pattern + r"$", re.IGNORECASE), build, used) for pattern, build, used in _TEMPLATES
+]
+
+
+def _from_template(text: str) -> Optional[Dict[str, Any]]:
+    for pattern, build, used in _COMPILED_TEMPLATES:
+        m = pattern.match(text)
+        if m is None:
+            continue
+        explicit = _ALPHABET_SET.search(text)
+        if explicit:
+            alphabet = [s for s in re.split(r"[,\s]+", explicit.group(1)) if s]
+            if any(len(s) != 1 for s in alphabet) or not set(used(m)) <= set(alphabet):
+                return None
+        elif not used(m):
+            # "odd length" names no symbols, so the alphabet would be a guess
+            return None
+        else:
+            alphabet = _alphabet_for(sorted(set(used(m))))
+            if alphabet is None:
+                return None
+        if any(not 0 < int(n) <= _MAX_MODULUS for n in re.findall(r"(?:divisible by|multiple of|mod|מתחלק ב-?)\s*(\d+)", text, re.IGNORECASE)):
+            return None
+        dfa = build(alphabet, m)
+        dfa["source"] = "template"
+        return dfa
+    return None
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+
+def _alphabet_for(symbols: List[str]) -> Optional[List[str]]:
+    """
+    Binary {0,1} or {a,b} when the symbols fit; otherwise the symbols themselves.
+    """
+    if set(symbols) <= {"0", "1"}:
+        return ["0", "1"]
+    if set(symbols) <= {"a", "b"}:
+        return ["a", "b"]
+    if all(len(s) == 1 for s in symbols):
+        return symbols
+    return None
+
+
+def _mod_counter(alphabet: List[str], k: int, r: int, counts: set) -> Dict[str, Any]:
+    """
+    k-state counter; r >= k is an impossible remainder, so nothing is accepted.
+    """
+    states = [f"q{i}" for i in range(k)]
+    return {
+        "type": "DFA",
+        "alphabet": alphabet,
+        "states": states,
+        "start_state": "q0",
+        "accept_states": [f"q{r}"] if r < k else [],
+        "transitions": {
+            f"q{i}": {a: f"q{(i + 1) % k}" if a in counts else f"q{i}" for a in alphabet}
+            for i in range(k)
+        },
+    }
+
+
+def _empty_note(k: int, r: int) -> str:
+    return f" שארית {r} אינה אפשרית מודולו {k}, ולכן השפה ריקה." if r >= k else ""
+
+
+def _complement(dfa: Dict[str, Any]) -> Dict[str, Any]:
+    accept = set(dfa["accept_states"])
+    dfa["accept_states"] = [s for s in dfa["states"] if s not in accept]
+    return dfa
+
+
+def _with_text(dfa: Dict[str, Any], explanation: str, logic: str) -> Dict[str, Any]:
+    dfa["explanation"] = explanation
+    dfa["logic"] = logic
+    return dfa
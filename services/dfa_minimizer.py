@@ -0,0 +1,175 @@
+# services/dfa_minimizer.py
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.dfa_compiled import CompiledDFA, get_compiled_dfa
+
+logger = logging.getLogger(__name__)
+
+# fields of a DFA dict that describe the machine; everything else (explanation, logic...) is kept as is
+_MACHINE_FIELDS = ("alphabet", "states", "start_state", "accept_states", "transitions")
+
+
+def minimize_dfa(dfa: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    מחזיר DFA מינימלי שקול (Hopcroft, O(n·|Σ|·log n)):
+    מצבים לא ישיגים מוסרים, ומצבים שקולים מתמזגים למצב אחד שנקרא בשם
+    המצב הראשון שלהם (לפי סדר "states"). שאר השדות (explanation, logic...) נשמרים.
+    "minimization" מתאר מה השתנה: original_states, unreachable ו-merged.
+    """
+    machine = get_compiled_dfa(dfa)
+    k = len(machine.symbols)
+    rows = machine.delta.tolist()
+
+    reachable = _reachable(machine, rows)
+    blocks, block_of = _hopcroft(machine, rows, reachable)
+
+    # representative = the block member listed first; the dead row sorts last
+    names = machine.states + ["TRAP"]
+    if "TRAP" in machine.state_ids:
+        names[machine.dead] = "TRAP_"
+    order = sorted(range(len(blocks)), key=lambda b: min(blocks[b]))
+    # the start state's block first, the rest in original order
+    start_block = block_of[machine.start]
+    order.remove(start_block)
+    order.insert(0, start_block)
+    rep = {b: names[min(blocks[b])] for b in order}
+
+    transitions = {
+        rep[b]: {machine.symbols[c]: rep[block_of[rows[min(blocks[b])][c]]] for c in range(k)}
+        for b in order
+    }
+    minimized = {key: value for key, value in dfa.items() if key not in _MACHINE_FIELDS}
+    minimized.update(
+        {
+            "type": "DFA",
+            "alphabet": list(machine.symbols),
+            "states": [rep[b] for b in order],
+            "start_state": rep[start_block],
+            "accept_states": [rep[b] for b in order if machine.accept[min(blocks[b])]],
+            "transitions": transitions,
+            "minimization": {
+                "original_states": len(machine.states),
+                "unreachable": [s for i, s in enumerate(machine.states) if i not in reachable],
+                "merged": {
+                    rep[b]: [names[s] for s in sorted(blocks[b])]
+                    for b in order
+                    if len(blocks[b]) > 1
+                },
+            },
+        }
+    )
+    logger.info("DFA minimized: %d -> %d states.", len(machine.states), len(order))
+    return minimized
+
+
+def dfa_equivalence(dfa_a: Dict[str, Any], dfa_b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    בודק שקילות של שני DFA ע"י BFS על אוטומט המכפלה (על איחוד האלפביתים;
+    תו שחסר באלפבית של אחד מהם מוביל אצלו לדחייה).
+    מחזיר {"equivalent": bool, "witness": המילה הקצרה ביותר (ובסדר לקסיקוגרפי)
+    שמבדילה ביניהם או None, "accepted_by": "a" / "b" / None}.
+    """
+    a = get_compiled_dfa(dfa_a)
+    b = get_compiled_dfa(dfa_b)
+    symbols = sorted(set(a.symbols) | set(b.symbols))
+    columns = [
+        (s, a.symbol_ids.get(s, a.UNKNOWN), b.symbol_ids.get(s, b.UNKNOWN))
+        for s in symbols
+    ]
+    rows_a = a.delta.tolist()
+    rows_b = b.delta.tolist()
+    accept_a = a.accept.tolist()
+    accept_b = b.accept.tolist()
+
+    start = (a.start, b.start)
+    # pair -> (parent pair, symbol) for rebuilding the witness
+    parent: Dict[Tuple[int, int], Optional[Tuple[Tuple[int, int], str]]] = {start: None}
+    queue = deque([start])
+    while queue:
+        pair = queue.popleft()
+        pa, pb = pair
+        if accept_a[pa] != accept_b[pb]:
+            return {
+                "equivalent": False,
+                "witness": _witness(parent, pair),
+                "accepted_by": "a" if accept_a[pa] else "b",
+            }
+        for symbol, col_a, col_b in columns:
+            nxt = (rows_a[pa][col_a], rows_b[pb][col_b])
+            if nxt not in parent:
+                parent[nxt] = (pair, symbol)
+                queue.append(nxt)
+
+    return {"equivalent": True, "witness": None, "accepted_by": None}
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+
+def _reachable(machine: CompiledDFA, rows: List[List[int]]) -> Set[int]:
+    k = len(machine.symbols)
+    seen = {machine.start}
+    stack = [machine.start]
+    while stack:
+        row = rows[stack.pop()]
+        for c in range(k):
+            if row[c] not in seen:
+                seen.add(row[c])
+                stack.append(row[c])
+    return seen
+
+
+def _hopcroft(machine: CompiledDFA, rows: List[List[int]], reachable: Set[int]) -> Tuple[List[Set[int]], Dict[int, int]]:
+    """
+    Hopcroft partition refinement over the reachable states.
+    Returns the blocks and state -> block index.
+    """
+    k = len(machine.symbols)
+    inverse: List[Dict[int, List[int]]] = [{} for _ in range(k)]
+    for s in reachable:
+        for c in range(k):
+            inverse[c].setdefault(rows[s][c], []).append(s)
+
+    accepting = {s for s in reachable if machine.accept[s]}
+    blocks = [part for part in (accepting, reachable - accepting) if part]
+    block_of = {s: i for i, part in enumerate(blocks) for s in part}
+
+    smaller = min(range(len(blocks)), key=lambda i: len(blocks[i]))
+    work = {(smaller, c) for c in range(k)} if len(blocks) > 1 else set()
+
+    while work:
+        splitter, c = work.pop()
+        # states with a c-transition into the splitter block
+        into = {p for t in blocks[splitter] for p in inverse[c].get(t, ())}
+
+        touched: Dict[int, Set[int]] = {}
+        for p in into:
+            touched.setdefault(block_of[p], set()).add(p)
+
+        for b, inside in touched.items():
+            if len(inside) == len(blocks[b]):
+                continue
+            outside = blocks[b] - inside
+            blocks[b] = inside
+            new = len(blocks)
+            blocks.append(outside)
+            for s in outside:
+                block_of[s] = new
+            for d in range(k):
+                if (b, d) in work:
+                    work.add((new, d))
+                else:
+                    work.add((b, d) if len(inside) <= len(outside) else (new, d))
+
+    return blocks, block_of
+
+
+def _witness(parent: Dict[Tuple[int, int], Any], pair: Tuple[int, int]) -> str:
+    symbols = []
+    while parent[pair] is not None:
+        pair, symbol = parent[pair]
+        symbols.append(symbol)
+    return "".join(reversed(symbols))
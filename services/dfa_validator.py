@@ -11,10 +11,19 @@
 --------------------------------------------------------------------
 """
 from services.language_spec_service import check_language_regularity
+from services.dfa_compiled import get_compiled_dfa
+from services.dfa_verifier import DEFAULT_MAX_LENGTH, verify_dfa
+from services.regex_compiler import RegexError, compile_regex
+
+# ציון מקסימלי ל-DFA עם counterexample ממצה – מתחת ל-STRICT_THRESHOLD (95) של automaton_service,
+# כך שאוטומט שגוי לעולם לא מוצג כ-high_confidence
+MAX_SCORE_WITH_COUNTEREXAMPLE = 94
 
 def run_dfa(dfa: dict, input_word: str) -> bool:
     """
     מריץ DFA על מחרוזת ומחזיר True אם מתקבלת, אחרת False.
+    מילה בודדת רצה ישירות על המילון (hash+קומפילציה עולים יותר מהריצה עצמה);
+    לריצה על הרבה מילים – run_dfa_batch.
     במקרה של שגיאה פנימית – מדפיס ומרים חריגה, כדי שה-validator ידע שיש בעיה.
     """
     try:
@@ -34,15 +43,53 @@ def run_dfa(dfa: dict, input_word: str) -> bool:
         raise
 
 
-def validate_dfa_against_spec(dfa: dict, spec: dict) -> dict:
+def run_dfa_batch(dfa: dict, words: list) -> list:
+    """
+    מריץ DFA על רשימת מילים בבת אחת (מטריצת מעברים של NumPy, gather אחד לכל מיקום).
+    מחזיר רשימת bool מקבילה ל-words.
+    כמו run_dfa: מעבר חסר שמילה מגיעה אליו מרים KeyError (ולא נספר כדחייה).
+    """
+    try:
+        return get_compiled_dfa(dfa).run_batch(list(words), strict=True).tolist()
+
+    except Exception as e:
+        print("[Validator] Error while running DFA:", e)
+        raise
+
+
+def reference_from_spec(spec: dict):
+    """
+    אוטומט ייחוס מתוך ה-SPEC: "reference_dfa" מפורש, או "regex" שמקומפל ל-DFA.
+    None אם אין ייחוס: ה-regex לא תקין, או גדול/מקונן מדי (מגבלות הגודל של
+    regex_compiler – ה-regex מגיע מהמודל, ואסור לו לתקוע את הבקשה).
+    """
+    if spec.get("reference_dfa"):
+        return spec["reference_dfa"]
+    regex = spec.get("regex")
+    if regex and isinstance(regex, str):
+        try:
+            return compile_regex(regex, spec.get("alphabet", []))
+        except (RegexError, RecursionError) as e:
+            print("[Validator] Ignoring invalid spec regex:", e)
+    return None
+
+
+def validate_dfa_against_spec(dfa: dict, spec: dict, max_length: int = DEFAULT_MAX_LENGTH) -> dict:
+    """
+    בודק את ה-DFA מול הדוגמאות של ה-SPEC (‎-15 לכל טעות), ואם יש ל-SPEC ייחוס
+    (regex / reference_dfa) – גם מול *כל* המילים עד אורך max_length (verify_dfa).
+    אז הציון חסום באחוז ההסכמה, וה-counterexamples הקצרים ביותר מתווספים ל-errors.
+    """
     errors = []
     score = 100
 
     accepted_examples = spec.get("accepted_examples", [])
     rejected_examples = spec.get("rejected_examples", [])
+    reference = reference_from_spec(spec)
+    report = None
 
-    # אם אין בכלל דוגמאות – לא סומכים על ה-DFA
-    if not accepted_examples and not rejected_examples:
+    # אם אין בכלל דוגמאות (וגם אין ייחוס) – לא סומכים על ה-DFA
+    if not accepted_examples and not rejected_examples and reference is None:
         return {
             "valid": False,
             "errors": [{
@@ -52,9 +99,10 @@ def validate_dfa_against_spec(dfa: dict, spec: dict) -> dict:
             "score": 0,
         }
 
+    results = run_dfa_batch(dfa, list(accepted_examples) + list(rejected_examples))
+
     # --- מילים שצריכות להתקבל ---
-    for word in accepted_examples:
-        res = run_dfa(dfa, word)
+    for word, res in zip(accepted_examples, results):
         if not res:
             errors.append({
                 "type": "false_reject",
@@ -65,8 +113,7 @@ def validate_dfa_against_spec(dfa: dict, spec: dict) -> dict:
             score -= 15
 
     # --- מילים שצריכות להידחות ---
-    for word in rejected_examples:
-        res = run_dfa(dfa, word)
+    for word, res in zip(rejected_examples, results[len(accepted_examples):]):
         if res:
             errors.append({
                 "type": "false_accept",
@@ -79,8 +126,24 @@ def validate_dfa_against_spec(dfa: dict, spec: dict) -> dict:
     if score < 0:
         score = 0
 
+    # --- בדיקה ממצה מול הייחוס ---
+    if reference is not None:
+        report = verify_dfa(dfa, reference, spec.get("alphabet", []), max_length=max_length)
+        for ce in report["counterexamples"]:
+            errors.append({
+                "type": "false_accept" if ce["actual"] == "accept" else "false_reject",
+                "word": ce["word"],
+                "expected": ce["expected"],
+                "actual": ce["actual"],
+                "source": "exhaustive",
+            })
+        score = min(score, int(report["accuracy"]))
+        if report["disagreements"]:
+            score = min(score, MAX_SCORE_WITH_COUNTEREXAMPLE)
+
     return {
         "valid": len(errors) == 0,
         "errors": errors,
         "score": score,
+        "exhaustive": report,
     }
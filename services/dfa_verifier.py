@@ -0,0 +1,89 @@
+# services/dfa_verifier.py
+import logging
+from typing import Any, Dict, List, Tuple
+
+from services.dfa_compiled import CompiledDFA, get_compiled_dfa
+
+logger = logging.getLogger(__name__)
+
+# default word length covered by the exhaustive check (cost is linear in it)
+DEFAULT_MAX_LENGTH = 12
+
+
+def verify_dfa(
+    dfa: Dict[str, Any],
+    reference: Dict[str, Any],
+    alphabet: List[str],
+    max_length: int = DEFAULT_MAX_LENGTH,
+    max_counterexamples: int = 5,
+) -> Dict[str, Any]:
+    """
+    משווה DFA לאוטומט ייחוס על *כל* המילים מעל alphabet באורך 0..max_length,
+    בלי לייצר את המילים עצמן: BFS שכבה-שכבה על זוגות (מצב ב-dfa, מצב בייחוס).
+    בכל שכבה נשמרים לכל זוג מספר המילים שמגיעות אליו ומילה אחת לדוגמה
+    (הראשונה בסדר לקסיקוגרפי), כך שהעלות O(max_length · |pairs| · |Σ|).
+
+    מחזיר:
+      - counterexamples: מילות אי-הסכמה מהקצרה ביותר והלאה (מילה אחת לכל זוג מצבים), עם expected/actual.
+      - words / disagreements: מספר המילים שנבדקו ומספר המילים עם אי-הסכמה.
+      - accuracy: אחוז המילים (עד max_length) שעליהן האוטומטים מסכימים.
+    """
+    machine = get_compiled_dfa(dfa)
+    oracle = get_compiled_dfa(reference)
+    symbols = [a for a in dict.fromkeys(alphabet) if len(a) == 1]
+    columns = [(s, _column(machine, s), _column(oracle, s)) for s in sorted(symbols)]
+    rows = machine.delta.tolist()
+    ref_rows = oracle.delta.tolist()
+    accept = machine.accept.tolist()
+    ref_accept = oracle.accept.tolist()
+
+    # pair -> (number of words of the current length reaching it, first such word)
+    layer: Dict[Tuple[int, int], Tuple[int, str]] = {(machine.start, oracle.start): (1, "")}
+    counterexamples: List[Dict[str, Any]] = []
+    total = 0
+    disagreements = 0
+
+    for length in range(max_length + 1):
+        for (a, b), (count, word) in sorted(layer.items(), key=lambda item: item[1][1]):
+            total += count
+            if accept[a] != ref_accept[b]:
+                disagreements += count
+                if len(counterexamples) < max_counterexamples:
+                    counterexamples.append(
+                        {
+                            "word": word,
+                            "expected": "accept" if ref_accept[b] else "reject",
+                            "actual": "accept" if accept[a] else "reject",
+                        }
+                    )
+        if length == max_length:
+            break
+
+        nxt: Dict[Tuple[int, int], Tuple[int, str]] = {}
+        for (a, b), (count, word) in layer.items():
+            for symbol, col, ref_col in columns:
+                pair = (rows[a][col], ref_rows[b][ref_col])
+                seen = nxt.get(pair)
+                if seen is None:
+                    nxt[pair] = (count, word + symbol)
+                else:
+                    nxt[pair] = (seen[0] + count, min(seen[1], word + symbol))
+        layer = nxt
+
+    accuracy = 100.0 * (total - disagreements) / total
+    logger.info(
+        "DFA verification up to length %d: %d/%d words disagree.",
+        max_length, disagreements, total,
+    )
+    return {
+        "equivalent_up_to_length": disagreements == 0,
+        "max_length": max_length,
+        "words": total,
+        "disagreements": disagreements,
+        "accuracy": accuracy,
+        "counterexamples": counterexamples,
+    }
+
+
+def _column(machine: CompiledDFA, symbol: str) -> int:
+    return machine.symbol_ids.get(symbol, machine.UNKNOWN)
@@ -2,6 +2,8 @@ import json
 import os
 from openai import OpenAI
 
+from services.pipeline_cache import pipeline_cache
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 """
@@ -18,6 +20,10 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 def check_language_regularity(description: str) -> dict:
+    cached = pipeline_cache.get("regularity", description)
+    if cached is not None:
+        return cached
+
     system_prompt = (
         "You are an expert in automata theory. "
         "Determine whether the described language is REGULAR. "
@@ -43,13 +49,20 @@ def check_language_regularity(description: str) -> dict:
         ],
     )
 
-    return json.loads(response.choices[0].message.content)
+    result = json.loads(response.choices[0].message.content)
+    if "is_regular" in result:
+        pipeline_cache.put("regularity", description, result)
+    return result
 
 
 def build_language_spec(description: str) -> dict:
     """
     מקבל תיאור טבעי של שפה ומחזיר SPEC פורמלי בעברית בלבד.
+    תיאור שכבר נבנה עבורו SPEC (אחרי נרמול) מוחזר מה-cache.
     """
+    cached = pipeline_cache.get("spec", description)
+    if cached is not None:
+        return cached
 
     # -----------------------------
     # SYSTEM PROMPT (באנגלית)
@@ -90,12 +103,16 @@ def build_language_spec(description: str) -> dict:
         "      \"q1 = ...\"\n"
         "  ],\n"
         "  \"accepted_examples\": [\"דוג1\", \"דוג2\", \"דוג3\"],\n"
-        "  \"rejected_examples\": [\"לא1\", \"לא2\", \"לא3\"]\n"
+        "  \"rejected_examples\": [\"לא1\", \"לא2\", \"לא3\"],\n"
+        "  \"regex\": \"(0|1)*1\"\n"
         "}\n\n"
         "Rules:\n"
         "- Return JSON ONLY (no text outside the JSON).\n"
         "- All content must be in Hebrew.\n"
         "- Examples must be short (length ≤ 5).\n"
+        "- \"regex\" is OPTIONAL: a regular expression for the EXACT language, over the alphabet only,\n"
+        "  using concatenation, |, *, +, ?, parentheses, ε (empty word), . (any symbol) and [..] (one of).\n"
+        "  Omit it (or use \"\") if you are not sure it is exactly right.\n"
         "- Rules must be explicit and unambiguous.\n"
     )
 
@@ -124,5 +141,7 @@ def build_language_spec(description: str) -> dict:
     spec["state_logic"] = spec.get("state_logic", [])
     spec["accepted_examples"] = spec.get("accepted_examples", [])
     spec["rejected_examples"] = spec.get("rejected_examples", [])
+    spec["regex"] = spec.get("regex") or ""
 
+    pipeline_cache.put("spec", description, spec)
     return spec
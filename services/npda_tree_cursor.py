@@ -0,0 +1,170 @@
+# services/npda_tree_cursor.py
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.npda_tree_engine import TreeNode, child_config, serialize_node
+from services.pda_compiled import EPSILON, CompiledPDA, get_compiled_pda
+from services.persistent_stack import StackInterner, StackNode
+from services.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+CURSOR_MAX = int(os.getenv("PDA_TREE_CURSOR_MAX", "500"))
+CURSOR_TTL_SEC = float(os.getenv("PDA_TREE_CURSOR_TTL_SEC", "1800"))
+CURSOR_MAX_BYTES = int(os.getenv("PDA_TREE_CURSOR_MAX_BYTES", str(64 * 1024 * 1024)))
+# a single cursor never grows beyond this many nodes
+CURSOR_MAX_NODES = int(os.getenv("PDA_TREE_CURSOR_MAX_NODES", "50000"))
+
+# rough per-node cost (slots object + stack cell + bookkeeping), CPython 64-bit
+_NODE_BYTES = 300
+
+
+class TreeCursor:
+    """
+    A computation tree that grows on demand: nodes are expanded only when a
+    client asks for them, from the cached compiled PDA. Like run_npda_with_tree,
+    a configuration that was already reached elsewhere is not expanded again
+    (the node records duplicate_of), and accepting nodes are leaves.
+    """
+
+    __slots__ = ("machine", "input_word", "word_ids", "interner", "nodes", "expanded", "seen", "duplicate_of", "lock")
+
+    def __init__(self, machine: CompiledPDA, input_word: str):
+        self.machine = machine
+        self.input_word = input_word
+        self.word_ids = machine.input_ids(input_word)
+        self.interner = StackInterner()
+        self.nodes: List[TreeNode] = []
+        self.expanded: Set[int] = set()
+        self.seen: Dict[Tuple[int, int, Optional[StackNode]], int] = {}
+        self.duplicate_of: Dict[int, int] = {}
+        # expansions run in the threadpool; two requests on one handle must not interleave
+        self.lock = threading.Lock()
+
+        root = TreeNode(
+            node_id=0,
+            state=machine.start,
+            position=0,
+            stack=self.interner.from_list([machine.initial_stack]),
+            parent_id=None,
+            consumed="START",
+        )
+        self._add(root)
+
+    def _add(self, node: TreeNode) -> None:
+        node.is_accepting = node.position == len(self.input_word) and self.machine.accepting[node.state]
+        self.nodes.append(node)
+
+    def _expand_one(self, node: TreeNode) -> None:
+        self.expanded.add(node.id)
+
+        key = (node.state, node.position, node.stack)
+        first = self.seen.setdefault(key, node.id)
+        if first != node.id:
+            self.duplicate_of[node.id] = first
+            return
+        if node.is_accepting:
+            return
+
+        machine = self.machine
+        top = None if node.stack is None else node.stack.top
+        reads = [(EPSILON, True)]
+        if node.position < len(self.input_word) and self.word_ids[node.position] > EPSILON:
+            reads.append((self.word_ids[node.position], False))
+
+        for read, epsilon in reads:
+            for move in machine.moves(node.state, read, top):
+                state, position, stack, consumed = child_config(node, move, self.input_word, self.interner, epsilon)
+                child = TreeNode(
+                    node_id=len(self.nodes),
+                    state=state,
+                    position=position,
+                    stack=stack,
+                    parent_id=node.id,
+                    consumed=consumed,
+                )
+                self._add(child)
+                node.children.append(child.id)
+
+        node.is_dead = not node.children
+
+    def expand(self, node_id: int, levels: int = 1, max_nodes: int = 500) -> Dict[str, Any]:
+        """
+        Expands `levels` levels below node_id (BFS) and returns every node it touched.
+        Stops early (truncated=True) after max_nodes new nodes or at CURSOR_MAX_NODES.
+        """
+        if not 0 <= node_id < len(self.nodes):
+            raise ValueError(f"unknown node id {node_id}")
+
+        start_count = len(self.nodes)
+        touched: Dict[int, TreeNode] = {node_id: self.nodes[node_id]}
+        queue = deque([(self.nodes[node_id], 0)])
+        truncated = False
+
+        while queue:
+            node, depth = queue.popleft()
+            if depth >= levels:
+                continue
+            if node.id not in self.expanded:
+                if len(self.nodes) - start_count >= max_nodes or len(self.nodes) >= CURSOR_MAX_NODES:
+                    truncated = True
+                    break
+                self._expand_one(node)
+            for child_id in node.children:
+                child = self.nodes[child_id]
+                touched[child_id] = child
+                queue.append((child, depth + 1))
+
+        return {
+            "tree": {nid: self._serialize(node) for nid, node in touched.items()},
+            "truncated": truncated,
+            "stats": {"nodes": len(self.nodes), "expanded": len(self.expanded)},
+        }
+
+    def _serialize(self, node: TreeNode) -> Dict[str, Any]:
+        out = serialize_node(node, self.machine)
+        out["expanded"] = node.id in self.expanded
+        if node.id in self.duplicate_of:
+            out["duplicate_of"] = self.duplicate_of[node.id]
+        return out
+
+
+_cursors: SessionStore[TreeCursor] = SessionStore(
+    max_entries=CURSOR_MAX,
+    ttl_seconds=CURSOR_TTL_SEC,
+    max_bytes=CURSOR_MAX_BYTES,
+    sizeof=lambda c: 1024 + _NODE_BYTES * len(c.nodes),
+)
+
+
+def open_tree(pda: Dict[str, Any], input_word: str, levels: int = 3, max_nodes: int = 500) -> Dict[str, Any]:
+    """
+    Creates a cursor and returns its handle with the root and its first `levels` levels.
+    """
+    if pda.get("type") != "PDA":
+        raise ValueError("Not a PDA")
+    cursor = TreeCursor(get_compiled_pda(pda), input_word)
+    result = cursor.expand(0, levels=levels, max_nodes=max_nodes)
+    handle = _cursors.put(cursor)
+    logger.info("NPDA tree cursor created: %s", handle)
+    return {"handle": handle, "root": 0, **result}
+
+
+def expand_tree(handle: str, node_id: int, levels: int = 1, max_nodes: int = 500) -> Optional[Dict[str, Any]]:
+    """
+    Expands a node of an open cursor; None when the handle is unknown or expired.
+    """
+    cursor = _cursors.get(handle)
+    if cursor is None:
+        return None
+    with cursor.lock:
+        result = cursor.expand(node_id, levels=levels, max_nodes=max_nodes)
+    _cursors.resize(handle)
+    return {"handle": handle, **result}
+
+
+def close_tree(handle: str) -> bool:
+    return _cursors.delete(handle)
@@ -1,35 +1,52 @@
 # services/npda_tree_engine.py
 
 from collections import deque
-from typing import Any, Dict, List, Tuple, Optional
-import uuid
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 
+from services.pda_compiled import EPSILON, CompiledPDA, Move, get_compiled_pda
+from services.persistent_stack import StackInterner, StackNode, to_list
+
 logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------
 # Types
 # ------------------------------------------------------------
 
-Stack = Tuple[str, ...]
+# persistent, hash-consed stack of CompiledPDA stack ids (None = empty);
+# names and lists appear only in the API output
+Stack = Optional[StackNode]
+
+
+# tree response layouts: dict-of-dicts keyed by node id, or parallel arrays
+TREE_FORMATS = ("nested", "columnar")
+# "tree": every transition allocates a node; "dag": equal configurations share one node
+TREE_MODES = ("tree", "dag")
 
 
 class TreeNode:
+    # node ids are sequential ints: the node's index in the run's node list
+    __slots__ = (
+        "id", "state", "position", "stack", "parent_id",
+        "consumed", "children", "is_accepting", "is_dead",
+    )
+
     def __init__(
         self,
-        state: str,
+        node_id: int,
+        state: int,
         position: int,
         stack: Stack,
-        parent_id: Optional[str],
+        parent_id: Optional[int],
         consumed: str,
     ):
-        self.id = str(uuid.uuid4())
+        self.id = node_id
         self.state = state
         self.position = position
         self.stack = stack
         self.parent_id = parent_id
         self.consumed = consumed
-        self.children: List[str] = []
+        self.children: List[int] = []
         self.is_accepting: bool = False
         self.is_dead: bool = False
 
@@ -43,10 +60,21 @@ def run_npda_with_tree(
     input_word: str,
     max_steps: int = 2000,
     max_nodes: int = 4000,
+    format: str = "nested",
+    mode: str = "tree",
 ) -> Dict[str, Any]:
     """
     מריץ NPDA ומחזיר עץ חישוב מלא (אי־דטרמיניזם).
+    format="columnar" מחזיר את העץ כמערכים מקבילים (ראו _serialize_columnar).
+    mode="dag": קונפיגורציה (state, position, stack) שכבר הופיעה לא מוקצית מחדש –
+    מוסיפים קשת לצומת הקיים (shared_edges), כך שהגרף קטן בהרבה במכונות לא-דטרמיניסטיות.
+    stats["shared"] = מספר הקונפיגורציות שהגיעו אליהן יותר מפעם אחת (לא מספר הקשתות).
     """
+    if format not in TREE_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(TREE_FORMATS)}")
+    if mode not in TREE_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(TREE_MODES)}")
+    dag = mode == "dag"
 
     if pda.get("type") != "PDA":
         return {
@@ -55,33 +83,61 @@ def run_npda_with_tree(
             "tree": {},
         }
 
-    states = pda["states"]
-    start_state = pda["start_state"]
-    accept_states = set(pda["accept_states"])
-    initial_stack_symbol = pda["initial_stack_symbol"]
-    transitions = pda["transitions"]
+    # compiled once per spec: interned ids + index on (state, read, stack_top)
+    machine = get_compiled_pda(pda)
+    accepting = machine.accepting
+    word_ids = machine.input_ids(input_word)
 
-    # Map: (state, read_symbol) -> transitions
-    transition_map: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
-    for t in transitions:
-        key = (t["from"], t["read"])
-        transition_map.setdefault(key, []).append(t)
+    interner = StackInterner()
 
     # Root node
     root = TreeNode(
-        state=start_state,
+        node_id=0,
+        state=machine.start,
         position=0,
-        stack=(initial_stack_symbol,),
+        stack=interner.from_list([machine.initial_stack]),
         parent_id=None,
         consumed="START",
     )
 
-    nodes: Dict[str, TreeNode] = {root.id: root}
+    nodes: List[TreeNode] = [root]
 
     queue = deque([root])
     visited = set()
-
-    accepting_node_id: Optional[str] = None
+    # dag mode: configuration -> node id, and the extra (parent, child) edges to shared nodes
+    node_of = {(root.state, root.position, root.stack): 0}
+    shared_edges: List[List[int]] = []
+    # configurations reached more than once (each counted once, whatever the parent)
+    shared_nodes = set()
+
+    def add_child(current: TreeNode, move: Move, epsilon: bool) -> None:
+        state, position, stack, consumed = child_config(current, move, input_word, interner, epsilon)
+        if dag:
+            key = (state, position, stack)
+            existing = node_of.get(key)
+            if existing is not None:
+                shared_nodes.add(existing)
+                # two moves of the same node may reach one configuration: keep a single edge
+                if existing in current.children:
+                    return
+                current.children.append(existing)
+                if nodes[existing].parent_id != current.id:
+                    shared_edges.append([current.id, existing])
+                return
+            node_of[key] = len(nodes)
+        child = TreeNode(
+            node_id=len(nodes),
+            state=state,
+            position=position,
+            stack=stack,
+            parent_id=current.id,
+            consumed=consumed,
+        )
+        nodes.append(child)
+        current.children.append(child.id)
+        queue.append(child)
+
+    accepting_node_id: Optional[int] = None
     steps = 0
 
     while queue and steps < max_steps and len(nodes) < max_nodes:
@@ -96,49 +152,28 @@ def run_npda_with_tree(
         # ✅ קבלה
         if (
             current.position == len(input_word)
-            and current.state in accept_states
+            and accepting[current.state]
         ):
             current.is_accepting = True
             accepting_node_id = current.id
             break
 
-        progressed = False
+        top = None if current.stack is None else current.stack.top
 
         # ------------------------------------------------
         # ε-transitions
         # ------------------------------------------------
-        for t in transition_map.get((current.state, ""), []):
-            child = _apply_transition(
-                current,
-                t,
-                input_word,
-                epsilon=True,
-            )
-            if child:
-                nodes[child.id] = child
-                current.children.append(child.id)
-                queue.append(child)
-                progressed = True
+        for move in machine.moves(current.state, EPSILON, top):
+            add_child(current, move, epsilon=True)
 
         # ------------------------------------------------
         # symbol transitions
         # ------------------------------------------------
-        if current.position < len(input_word):
-            symbol = input_word[current.position]
-            for t in transition_map.get((current.state, symbol), []):
-                child = _apply_transition(
-                    current,
-                    t,
-                    input_word,
-                    epsilon=False,
-                )
-                if child:
-                    nodes[child.id] = child
-                    current.children.append(child.id)
-                    queue.append(child)
-                    progressed = True
-
-        if not progressed:
+        if current.position < len(input_word) and word_ids[current.position] > EPSILON:
+            for move in machine.moves(current.state, word_ids[current.position], top):
+                add_child(current, move, epsilon=False)
+
+        if not current.children:
             current.is_dead = True
 
     # ------------------------------------------------------------
@@ -146,18 +181,24 @@ def run_npda_with_tree(
     # ------------------------------------------------------------
 
     accepting_path = []
-    if accepting_node_id:
+    if accepting_node_id is not None:
         accepting_path = _extract_path(nodes, accepting_node_id)
 
     return {
         "accepted": accepting_node_id is not None,
         "accepting_node_id": accepting_node_id,
         "accepting_path": accepting_path,
-        "tree": _serialize_tree(nodes),
+        "tree": (
+            _serialize_columnar(nodes, machine)
+            if format == "columnar"
+            else _serialize_tree(nodes, machine)
+        ),
         "stats": {
             "nodes": len(nodes),
             "steps": steps,
+            "shared": len(shared_nodes),
         },
+        **({"shared_edges": shared_edges} if dag else {}),
     }
 
 
@@ -165,61 +206,82 @@ def run_npda_with_tree(
 # Helpers
 # ------------------------------------------------------------
 
-def _apply_transition(
+def child_config(
     node: TreeNode,
-    t: Dict[str, Any],
+    move: Move,
     input_word: str,
+    interner: StackInterner,
     epsilon: bool,
-) -> Optional[TreeNode]:
-
-    stack = list(node.stack)
-
-    pop_symbol = t["pop"]
-    if pop_symbol:
-        if not stack or stack[-1] != pop_symbol:
-            return None
-        stack.pop()
-
-    push_list = t.get("push", [])
-    for sym in reversed(push_list):
-        stack.append(sym)
+) -> Tuple[int, int, Stack, str]:
+    """
+    (state, position, stack, consumed) after applying move to node's configuration.
+    Shared by run_npda_with_tree and the lazy TreeCursor.
+    """
+    # the index only returns moves whose pop matches the current top
+    to, pops, push = move
+    stack = node.stack.below if pops else node.stack
+    stack = interner.push_all(stack, push)
 
     if epsilon:
-        new_position = node.position
-        consumed = "ε"
-    else:
-        new_position = node.position + 1
-        consumed = input_word[node.position]
-
-    return TreeNode(
-        state=t["to"],
-        position=new_position,
-        stack=tuple(stack),
-        parent_id=node.id,
-        consumed=consumed,
-    )
+        return to, node.position, stack, "ε"
+    return to, node.position + 1, stack, input_word[node.position]
 
 
-def _extract_path(nodes: Dict[str, TreeNode], node_id: str) -> List[str]:
+def _extract_path(nodes: List[TreeNode], node_id: Optional[int]) -> List[int]:
     path = []
-    while node_id:
+    while node_id is not None:
         path.append(node_id)
         node_id = nodes[node_id].parent_id
     return list(reversed(path))
 
 
-def _serialize_tree(nodes: Dict[str, TreeNode]) -> Dict[str, Any]:
+def serialize_node(node: TreeNode, machine: CompiledPDA) -> Dict[str, Any]:
+    symbols = machine.stack_symbols
     return {
-        node_id: {
-            "id": node.id,
-            "state": node.state,
-            "position": node.position,
-            "stack": list(node.stack),
-            "parent": node.parent_id,
-            "children": node.children,
-            "consumed": node.consumed,
-            "is_accepting": node.is_accepting,
-            "is_dead": node.is_dead,
-        }
-        for node_id, node in nodes.items()
+        "id": node.id,
+        "state": machine.states[node.state],
+        "position": node.position,
+        "stack": [symbols[s] for s in to_list(node.stack)],
+        "parent": node.parent_id,
+        "children": node.children,
+        "consumed": node.consumed,
+        "is_accepting": node.is_accepting,
+        "is_dead": node.is_dead,
+    }
+
+
+def _serialize_tree(nodes: List[TreeNode], machine: CompiledPDA) -> Dict[int, Any]:
+    return {node.id: serialize_node(node, machine) for node in nodes}
+
+
+def _serialize_columnar(nodes: List[TreeNode], machine: CompiledPDA) -> Dict[str, Any]:
+    """
+    Parallel arrays indexed by node id. States and stacks are indices into the
+    side tables "states" / "stacks" (each distinct stack is serialized once);
+    parent is -1 for the root. Children follow from the parent array.
+    """
+    symbols = machine.stack_symbols
+    stack_index: Dict[int, int] = {}
+    stacks: List[List[str]] = []
+    stack_col: List[int] = []
+    for node in nodes:
+        key = id(node.stack)
+        idx = stack_index.get(key)
+        if idx is None:
+            idx = len(stacks)
+            stack_index[key] = idx
+            stacks.append([symbols[s] for s in to_list(node.stack)])
+        stack_col.append(idx)
+
+    return {
+        "format": "columnar",
+        "states": machine.states,
+        "stacks": stacks,
+        "state": [node.state for node in nodes],
+        "position": [node.position for node in nodes],
+        "parent": [-1 if node.parent_id is None else node.parent_id for node in nodes],
+        "consumed": [node.consumed for node in nodes],
+        "stack": stack_col,
+        "accepting": [node.id for node in nodes if node.is_accepting],
+        "dead": [node.id for node in nodes if node.is_dead],
     }
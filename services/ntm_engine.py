@@ -0,0 +1,234 @@
+# services/ntm_engine.py
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+
+from services.persistent_stack import StackInterner, StackNode, to_list
+from services.tm_simulator import (
+    MAX_SYMBOLS,
+    Tape,
+    TMSpecError,
+    snapshot_window,
+    validate_tm_spec,
+    _DELTA_MOVE,
+    _InternedSpec,
+    _MOVE_DELTA,
+)
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Types
+# ------------------------------------------------------------
+
+# (to_state_id, write_symbol_id, head_delta)
+Option = Tuple[int, int, int]
+
+
+class CompiledNTM(_InternedSpec):
+    """
+    Single-tape nondeterministic TM: like CompiledTM, but every table cell holds
+    the tuple of all transitions for (state, symbol) (empty tuple = stuck).
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        validate_tm_spec(spec, allow_nondeterminism=True)
+        if spec.get("tapes", 1) != 1:
+            raise TMSpecError("nondeterministic runs support single-tape machines only")
+
+        self._intern(spec)
+
+        cells: Dict[int, List[Option]] = {}
+        for t in (spec.get("transitions") or []):
+            index = self.state_ids[t["from"]] * MAX_SYMBOLS + self.symbol_ids[t["read"]]
+            option = (self.state_ids[t["to"]], self.symbol_ids[t["write"]], _MOVE_DELTA[t["move"]])
+            if option not in cells.setdefault(index, []):
+                cells[index].append(option)
+
+        self.table: List[Tuple[Option, ...]] = [()] * (len(self.states) * MAX_SYMBOLS)
+        for index, options in cells.items():
+            self.table[index] = tuple(options)
+
+
+# ------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------
+
+def run_ntm(
+    spec: Dict[str, Any],
+    input_str: str,
+    max_steps: int = 500,
+    max_nodes: int = 20000,
+    window_radius: int = 12,
+) -> Dict[str, Any]:
+    """
+    מריץ NTM בחיפוש BFS על עץ הקונפיגורציות ומחזיר קבלה/דחייה + הענף המקבל.
+
+    • max_steps – עומק מקסימלי (אורך חישוב) של ענף.
+    • max_nodes – מספר קונפיגורציות מקסימלי שנוצרות.
+    • הסרט הוא zipper של שתי מחסניות persistent (משמאל ומימין לראש), כך שאחים
+      חולקים את כל הסרט פרט לתא שנכתב, וקונפיגורציות זהות מזוהות ב-O(1).
+    """
+    machine = CompiledNTM(spec)
+    accepting = machine.accepting
+    rejecting = machine.rejecting
+    table = machine.table
+
+    # foreign input characters get ids past the alphabet (no transitions read them)
+    symbols = list(machine.symbols)
+    ids = dict(machine.symbol_ids)
+    for ch in input_str:
+        if ch not in ids:
+            if len(symbols) >= MAX_SYMBOLS:
+                raise TMSpecError(f"tape supports at most {MAX_SYMBOLS} distinct symbols")
+            ids[ch] = len(symbols)
+            symbols.append(ch)
+    cells = [ids[ch] for ch in input_str.rstrip(machine.blank)]
+
+    interner = StackInterner()
+
+    # zipper: left/right stacks hold the cells beside the head, nearest cell on top;
+    # a blank is never pushed onto an empty stack, so equal tapes have equal zippers
+    def move(left: Optional[StackNode], cur: int, right: Optional[StackNode], delta: int):
+        if delta == 1:
+            if left is not None or cur != 0:
+                left = interner.push(left, cur)
+            if right is None:
+                return left, 0, None
+            return left, right.top, right.below
+        if delta == -1:
+            if right is not None or cur != 0:
+                right = interner.push(right, cur)
+            if left is None:
+                return None, 0, right
+            return left.below, left.top, right
+        return left, cur, right
+
+    # flat arena of configurations (index = node id)
+    parent: List[int] = [-1]
+    via: List[Optional[Option]] = [None]
+    n_state: List[int] = [machine.start]
+    n_head: List[int] = [0]
+    n_left: List[Optional[StackNode]] = [None]
+    n_cur: List[int] = [cells[0] if cells else 0]
+    n_right: List[Optional[StackNode]] = [interner.from_list(reversed(cells[1:]))]
+    n_depth: List[int] = [0]
+
+    seen = {(machine.start, 0, None, n_cur[0], n_right[0])}
+    queue: Deque[int] = deque([0])
+    expanded = 0
+    duplicates = 0
+    truncated: Optional[str] = None
+    accepting_node: Optional[int] = 0 if accepting[machine.start] else None
+
+    while queue and accepting_node is None:
+        node = queue.popleft()
+        state = n_state[node]
+        if rejecting[state]:
+            continue
+        if n_depth[node] >= max_steps:
+            truncated = truncated or "max_steps_reached"
+            continue
+
+        expanded += 1
+        for option in table[state * MAX_SYMBOLS + n_cur[node]]:
+            to, write, delta = option
+            left, cur, right = move(n_left[node], write, n_right[node], delta)
+            head = n_head[node] + delta
+            key = (to, head, left, cur, right)
+            if key in seen:
+                duplicates += 1
+                continue
+            if len(parent) >= max_nodes:
+                truncated = "max_nodes_reached"
+                queue.clear()
+                break
+
+            seen.add(key)
+            parent.append(node)
+            via.append(option)
+            n_state.append(to)
+            n_head.append(head)
+            n_left.append(left)
+            n_cur.append(cur)
+            n_right.append(right)
+            n_depth.append(n_depth[node] + 1)
+
+            if accepting[to]:
+                accepting_node = len(parent) - 1
+                break
+            queue.append(len(parent) - 1)
+
+    # ------------------------------------------------------------
+    # Build result
+    # ------------------------------------------------------------
+
+    def config(node: int) -> Dict[str, Any]:
+        left = to_list(n_left[node])
+        row = left + [n_cur[node]] + list(reversed(to_list(n_right[node])))
+        offset = n_head[node] - len(left)
+        text = "".join(symbols[c] for c in row)
+        stripped = text.lstrip(machine.blank)
+        offset += len(text) - len(stripped)
+        stripped = stripped.rstrip(machine.blank)
+        return {
+            "state": machine.states[n_state[node]],
+            "head": n_head[node],
+            "step": n_depth[node],
+            "tape": stripped,
+            "offset": offset if stripped else 0,
+        }
+
+    accepting_path: List[Dict[str, Any]] = []
+    window: List[Dict[str, Any]] = []
+    if accepting_node is not None:
+        chain = []
+        node = accepting_node
+        while node != -1:
+            chain.append(node)
+            node = parent[node]
+        chain.reverse()
+
+        for node in chain:
+            entry = {"config": config(node)}
+            if via[node] is not None:
+                to, write, delta = via[node]
+                prev = parent[node]
+                entry["transition"] = {
+                    "from": machine.states[n_state[prev]],
+                    "read": symbols[n_cur[prev]],
+                    "to": machine.states[to],
+                    "write": symbols[write],
+                    "move": _DELTA_MOVE[delta],
+                }
+            accepting_path.append(entry)
+
+        final = accepting_path[-1]["config"]
+        window = snapshot_window(Tape.from_string(final["tape"], final["offset"], symbols), final["head"], window_radius)
+
+    if accepting_node is not None:
+        reason = "accept_state"
+    else:
+        reason = truncated or "all_branches_halted"
+
+    logger.info(
+        "NTM run on '%s': %s (nodes=%d, expanded=%d, duplicates=%d)",
+        input_str, reason, len(parent), expanded, duplicates,
+    )
+
+    return {
+        "accepted": accepting_node is not None,
+        # a reject is definitive only when every branch halted within the budgets
+        "definitive": accepting_node is not None or truncated is None,
+        "reason": reason,
+        "accepting_path": accepting_path,
+        "window": window,
+        "stats": {
+            "nodes": len(parent),
+            "expanded": expanded,
+            "duplicates": duplicates,
+            "max_depth": max(n_depth),
+            "shared_tape_cells": len(interner),
+        },
+    }
@@ -0,0 +1,231 @@
+# services/pda_analysis.py
+import logging
+from typing import Any, Dict, List, Set, Tuple
+
+from services.pda_compiled import EPSILON, CompiledPDA, get_compiled_pda
+
+logger = logging.getLogger(__name__)
+
+
+def epsilon_closure(machine: CompiledPDA) -> List[List[int]]:
+    """
+    For every state, the states reachable from it by ε-transitions alone
+    (ignoring the stack, so an over-approximation), the state itself included.
+    """
+    edges: List[Set[int]] = [set() for _ in machine.states]
+    for base, moves in _moves_by_base(machine):
+        state, read = divmod(base, machine.n_reads)
+        if read == EPSILON:
+            edges[state].update(to for to, _, _ in moves)
+    return [sorted(_closure([s], edges)) for s in range(len(machine.states))]
+
+
+def growing_epsilon_cycles(machine: CompiledPDA) -> List[List[Tuple[int, int]]]:
+    """
+    ε-cycles that grow the stack forever.
+
+    Nodes are (state, top). An ε-move that pushes something leads from (p, X)
+    to (q, last pushed symbol), and the move is enabled there by construction;
+    its weight is the net stack growth (pushed - popped >= 0). An ε-move that
+    neither pops nor pushes keeps the top: (p, X) -> (q, X) with weight 0. A strongly
+    connected component with an internal edge of positive weight is a loop a run
+    can take indefinitely while the stack keeps growing. Loops that need an
+    ε-pop to uncover a symbol are not tracked (those may be bounded anyway).
+    """
+    edges: Dict[Tuple[int, int], List[Tuple[Tuple[int, int], int]]] = {}
+    for state in range(len(machine.states)):
+        for top in range(machine.n_stack):
+            for to, pops, push in machine.moves(state, EPSILON, top):
+                if push:
+                    edges.setdefault((state, top), []).append(((to, push[-1]), len(push) - int(pops)))
+                elif not pops:
+                    edges.setdefault((state, top), []).append(((to, top), 0))
+
+    cycles = []
+    for component in _strongly_connected(edges):
+        members = set(component)
+        grows = any(
+            weight > 0 and target in members
+            for node in component
+            for target, weight in edges.get(node, ())
+        )
+        if grows:
+            cycles.append(sorted(component))
+    return cycles
+
+
+def has_growing_epsilon_cycle(machine: CompiledPDA) -> bool:
+    """
+    Whether some reachable state lies on a growing ε-cycle: a search over such a
+    machine can never exhaust its configurations. Computed once per machine.
+    """
+    found = machine.analysis.get("growing_epsilon_cycle")
+    if found is None:
+        found = any(machine.reachable[q] for cycle in growing_epsilon_cycles(machine) for q, _ in cycle)
+        machine.analysis["growing_epsilon_cycle"] = found
+    return found
+
+
+def live_states(machine: CompiledPDA, word_ids: List[int]) -> List[bytearray]:
+    """
+    live[i][q] == 0 means no run from state q at position i can accept: even
+    ignoring the stack, no accepting state is reachable while reading the rest of
+    the word. Configurations in such states can be pruned without losing acceptance.
+    """
+    n = len(word_ids)
+    n_states = len(machine.states)
+    eps_back: List[Set[int]] = [set() for _ in range(n_states)]
+    # read id -> to state -> from states
+    read_back: Dict[int, List[Set[int]]] = {}
+    for base, moves in _moves_by_base(machine):
+        state, read = divmod(base, machine.n_reads)
+        if read == EPSILON:
+            for to, _, _ in moves:
+                eps_back[to].add(state)
+        else:
+            back = read_back.setdefault(read, [set() for _ in range(n_states)])
+            for to, _, _ in moves:
+                back[to].add(state)
+
+    live: List[bytearray] = [bytearray(n_states) for _ in range(n + 1)]
+    current = _closure([q for q in range(n_states) if machine.accepting[q]], eps_back)
+    for q in current:
+        live[n][q] = 1
+    for i in range(n - 1, -1, -1):
+        back = read_back.get(word_ids[i])
+        seeds = {p for q in current for p in back[q]} if back else set()
+        current = _closure(seeds, eps_back)
+        for q in current:
+            live[i][q] = 1
+    return live
+
+
+def analyze_pda(pda: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ניתוח סטטי של NPDA (ללא הרצה):
+      - unreachable_states: מצבים שאף מעבר אפשרי לא מגיע אליהם.
+      - dropped_transitions: אינדקסים של מעברים שלעולם לא יופעלו (ממצב לא ישיג,
+        או pop של סמל שאף מעבר לא דוחף) – הסימולטורים מתעלמים מהם.
+      - epsilon_closure: לכל מצב, המצבים הישיגים במעברי ε בלבד.
+      - growing_epsilon_cycles: לולאות ε שמגדילות את המחסנית בלי לקרוא קלט –
+        הסיבה הנפוצה לכך שחיפוש BFS ממצה את התקציב.
+      - dead_states: מצבים שמהם אין שום מסלול (גם בהתעלמות מהמחסנית) למצב מקבל.
+    """
+    if pda.get("type") != "PDA":
+        raise ValueError("Not a PDA")
+    machine = get_compiled_pda(pda)
+    states = machine.states
+    symbols = machine.stack_symbols
+
+    closure = epsilon_closure(machine)
+    cycles = growing_epsilon_cycles(machine)
+    co_reachable = _co_reachable(machine)
+
+    report = {
+        "unreachable_states": [s for i, s in enumerate(states) if not machine.reachable[i]],
+        "dropped_transitions": machine.dropped,
+        "dead_states": [s for i, s in enumerate(states) if machine.reachable[i] and not co_reachable[i]],
+        "epsilon_closure": {
+            states[i]: [states[q] for q in qs]
+            for i, qs in enumerate(closure)
+            if machine.reachable[i] and len(qs) > 1
+        },
+        "growing_epsilon_cycles": [
+            [{"state": states[q], "top": symbols[x]} for q, x in cycle]
+            for cycle in cycles
+        ],
+    }
+    logger.info(
+        "PDA analysis: %d unreachable states, %d dropped transitions, %d growing ε-cycles.",
+        len(report["unreachable_states"]),
+        len(report["dropped_transitions"]),
+        len(cycles),
+    )
+    return report
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+
+def _moves_by_base(machine: CompiledPDA) -> List[Tuple[int, Tuple[Any, ...]]]:
+    """
+    (state * n_reads + read, moves) for every bucket - each move appears at least once.
+    """
+    buckets = list(machine.no_pop.items())
+    for key, moves in machine.by_top.items():
+        buckets.append((key // machine.n_stack, moves))
+    return buckets
+
+
+def _closure(seeds: Any, edges: List[Set[int]]) -> Set[int]:
+    seen = set(seeds)
+    stack = list(seen)
+    while stack:
+        for nxt in edges[stack.pop()]:
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return seen
+
+
+def _co_reachable(machine: CompiledPDA) -> List[bool]:
+    """
+    States from which some accepting state is reachable, ignoring input and stack.
+    """
+    back: List[Set[int]] = [set() for _ in machine.states]
+    for base, moves in _moves_by_base(machine):
+        state = base // machine.n_reads
+        for to, _, _ in moves:
+            back[to].add(state)
+    found = _closure([q for q in range(len(machine.states)) if machine.accepting[q]], back)
+    return [q in found for q in range(len(machine.states))]
+
+
+def _strongly_connected(edges: Dict[Tuple[int, int], List[Tuple[Tuple[int, int], int]]]) -> List[List[Tuple[int, int]]]:
+    """
+    Iterative Tarjan; only components with at least one internal edge are returned.
+    """
+    index: Dict[Tuple[int, int], int] = {}
+    low: Dict[Tuple[int, int], int] = {}
+    on_stack: Set[Tuple[int, int]] = set()
+    stack: List[Tuple[int, int]] = []
+    components: List[List[Tuple[int, int]]] = []
+
+    for root in list(edges):
+        if root in index:
+            continue
+        work = [(root, 0)]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, i = work[-1]
+            succ = edges.get(node, [])
+            if i < len(succ):
+                work[-1] = (node, i + 1)
+                target = succ[i][0]
+                if target not in index:
+                    index[target] = low[target] = len(index)
+                    stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, 0))
+                elif target in on_stack:
+                    low[node] = min(low[node], index[target])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                members = set(component)
+                if len(component) > 1 or any(t in members for t, _ in edges.get(node, ())):
+                    components.append(component)
+    return components
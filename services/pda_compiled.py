@@ -0,0 +1,217 @@
+# services/pda_compiled.py
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# read id of an ε-transition; real input symbols get ids 1, 2, ...
+EPSILON = 0
+
+# (to_state, pops_top, stack symbols in push order - the last one ends up on top)
+Move = Tuple[int, bool, Tuple[int, ...]]
+
+
+def _push_symbols(push_raw: Any) -> List[str]:
+    """
+    push נתון כרשימה מלמטה למעלה (כפי ש-_normalize_pda מחזיר), אבל להיות סלחניים גם למחרוזת.
+    """
+    if isinstance(push_raw, list):
+        return [str(s) for s in push_raw if str(s).strip() != "" and str(s) != "ε"]
+    if isinstance(push_raw, str):
+        s = push_raw.strip()
+        if s not in {"", "ε"}:
+            return [ch for ch in s]
+    return []
+
+
+class CompiledPDA:
+    """
+    PDA (in the _normalize_pda format) with states, input symbols and stack
+    symbols interned to ints, and transitions indexed for the simulators:
+
+    - by_top[(state, read, top)]: every move that may fire with `top` on the
+      stack - the moves popping `top` merged with the no-pop moves, in spec order
+    - no_pop[(state, read)]: moves that do not pop (the only ones possible on an
+      empty stack, or when no transition pops the current top)
+
+    read == EPSILON is the ε bucket. Push lists are pre-normalised and
+    pre-reversed, so a move applies as pop + push_all.
+
+    Transitions that can never fire - from a state no transition reaches, or
+    popping a symbol nothing ever pushes - are left out of the index; their
+    spec indices are kept in `dropped` and the reachable states in `reachable`.
+    """
+
+    def __init__(self, pda: Dict[str, Any]):
+        self.states: List[str] = list(dict.fromkeys(pda.get("states", [])))
+        self.state_ids: Dict[str, int] = {s: i for i, s in enumerate(self.states)}
+        self.reads: List[str] = [""]
+        self.read_ids: Dict[str, int] = {"": EPSILON}
+        self.stack_symbols: List[str] = []
+        self.stack_ids: Dict[str, int] = {}
+
+        start_name = pda.get("start_state", self.states[0] if self.states else "")
+        self.start: int = self._state(start_name)
+        self.initial_stack: int = self._stack(pda.get("initial_stack_symbol", "Z"))
+        for sym in pda.get("stack_alphabet") or []:
+            self._stack(str(sym))
+
+        # (from, read, pop, move, spec index)
+        parsed: List[Tuple[int, int, Optional[int], Move, int]] = []
+        for idx, t in enumerate(pda.get("transitions", [])):
+            from_state = t.get("from")
+            if from_state is None:
+                logger.warning("Skipping transition without 'from' field: %s", t)
+                continue
+            frm = self._state(from_state)
+            read = self._read(t.get("read", ""))
+
+            pop_symbol = t.get("pop", "")
+            pop = None if pop_symbol in ("", "ε", None) else self._stack(pop_symbol)
+            # הרשימה מסודרת מלמטה למעלה → דוחפים במהופך
+            push = tuple(self._stack(s) for s in reversed(_push_symbols(t.get("push", []))))
+            to = self._state(t.get("to", from_state))
+
+            parsed.append((frm, read, pop, (to, pop is not None, push), idx))
+
+        live = self._reachable_transitions(parsed)
+        self.dropped: List[int] = [idx for i, (*_, idx) in enumerate(parsed) if not live[i]]
+        grouped: Dict[Tuple[int, int], List[Tuple[Optional[int], Move]]] = {}
+        for i, (frm, read, pop, move, _) in enumerate(parsed):
+            if live[i]:
+                grouped.setdefault((frm, read), []).append((pop, move))
+
+        accept_states = set(pda.get("accept_states", []))
+        self.accepting: List[bool] = [s in accept_states for s in self.states]
+
+        self.n_reads = len(self.reads)
+        self.n_stack = len(self.stack_symbols)
+        self.n_moves = sum(len(moves) for moves in grouped.values())
+        # static-analysis results computed on demand (pda_analysis), kept with the machine
+        self.analysis: Dict[str, Any] = {}
+
+        self.no_pop: Dict[int, Tuple[Move, ...]] = {}
+        self.by_top: Dict[int, Tuple[Move, ...]] = {}
+        for (frm, read), moves in grouped.items():
+            base = frm * self.n_reads + read
+            no_pop = tuple(m for pop, m in moves if pop is None)
+            if no_pop:
+                self.no_pop[base] = no_pop
+            for top in {pop for pop, _ in moves if pop is not None}:
+                self.by_top[base * self.n_stack + top] = tuple(
+                    m for pop, m in moves if pop is None or pop == top
+                )
+
+    def _reachable_transitions(self, parsed: List[Tuple[int, int, Optional[int], Move, int]]) -> List[bool]:
+        """
+        Fixpoint over-approximating what a run can reach, ignoring stack order:
+        a transition may fire once its source state is reachable and its pop
+        symbol (if any) was pushed by something that may fire.
+        """
+        reachable = [False] * len(self.states)
+        reachable[self.start] = True
+        pushed = [False] * len(self.stack_symbols)
+        pushed[self.initial_stack] = True
+        live = [False] * len(parsed)
+
+        changed = True
+        while changed:
+            changed = False
+            for i, (frm, _, pop, (to, _, push), _) in enumerate(parsed):
+                if live[i] or not reachable[frm] or (pop is not None and not pushed[pop]):
+                    continue
+                live[i] = changed = True
+                reachable[to] = True
+                for sym in push:
+                    pushed[sym] = True
+
+        self.reachable: List[bool] = reachable
+        return live
+
+    # --------------------------------------------------------
+    # interning (compile time only)
+    # --------------------------------------------------------
+
+    def _state(self, name: str) -> int:
+        sid = self.state_ids.get(name)
+        if sid is None:
+            sid = len(self.states)
+            self.states.append(name)
+            self.state_ids[name] = sid
+        return sid
+
+    def _read(self, sym: str) -> int:
+        rid = self.read_ids.get(sym)
+        if rid is None:
+            rid = len(self.reads)
+            self.reads.append(sym)
+            self.read_ids[sym] = rid
+        return rid
+
+    def _stack(self, sym: str) -> int:
+        sid = self.stack_ids.get(sym)
+        if sid is None:
+            sid = len(self.stack_symbols)
+            self.stack_symbols.append(sym)
+            self.stack_ids[sym] = sid
+        return sid
+
+    # --------------------------------------------------------
+    # lookups
+    # --------------------------------------------------------
+
+    def input_ids(self, word: str) -> List[int]:
+        """
+        Read ids of the word's characters; -1 for characters no transition reads.
+        """
+        return [self.read_ids.get(ch, -1) if ch else -1 for ch in word]
+
+    def moves(self, state: int, read: int, top: Optional[int]) -> Tuple[Move, ...]:
+        base = state * self.n_reads + read
+        if top is not None:
+            hit = self.by_top.get(base * self.n_stack + top)
+            if hit is not None:
+                return hit
+        return self.no_pop.get(base, ())
+
+
+# ------------------------------------------------------------
+# Cache
+# ------------------------------------------------------------
+
+# only these fields affect the automaton (explanations, examples etc. are ignored)
+_SPEC_FIELDS = ("states", "start_state", "accept_states", "initial_stack_symbol", "stack_alphabet", "transitions")
+
+_compiled: SessionStore[CompiledPDA] = SessionStore(
+    max_entries=256,
+    ttl_seconds=1800,
+    max_bytes=32 * 1024 * 1024,
+    sizeof=lambda m: 1024 + 128 * (m.n_moves + len(m.by_top)),
+)
+
+
+def pda_spec_key(pda: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {k: pda.get(k) for k in _SPEC_FIELDS},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_compiled_pda(pda: Dict[str, Any]) -> CompiledPDA:
+    """
+    Compiles a PDA once per distinct spec (keyed by a hash of its fields).
+    """
+    key = pda_spec_key(pda)
+    machine = _compiled.get(key)
+    if machine is None:
+        machine = CompiledPDA(pda)
+        _compiled.put(machine, key=key)
+    return machine
@@ -0,0 +1,212 @@
+# services/pda_membership.py
+from itertools import product
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+from services.batch_pool import map_chunks
+from services.pda_analysis import live_states
+from services.pda_compiled import EPSILON, CompiledPDA, get_compiled_pda
+
+logger = logging.getLogger(__name__)
+
+# מחסנית ריקה: סמל תחתית וירטואלי שאף מעבר אינו שולף
+BOTTOM = -1
+
+# budget of derived items (a safety net for huge automata; words of a few hundred symbols fit easily)
+DEFAULT_MAX_ITEMS = 2_000_000
+
+# frame = (position, state, top): a stack symbol that just became the top
+Frame = Tuple[int, int, int]
+
+
+def decide_pda(
+    pda: Dict[str, Any],
+    input_word: str,
+    max_items: int = DEFAULT_MAX_ITEMS,
+) -> Dict[str, Any]:
+    """
+    בדיקת שייכות מדויקת ופולינומית (בסגנון Earley) ל-NPDA, ללא תלות בתקציב BFS.
+
+    כל מעבר מנורמל ל"שלוף X, דחוף γ" (מעבר שלא שולף = שלוף X ודחוף γ מעל X).
+    "מסגרת" (i, p, X) פירושה: ניתן להגיע למצב p במיקום i כש-X בראש המחסנית.
+    סיכום (i, p, X) ⇒ (j, q) פירושו: מהמסגרת ניתן להגיע ל-q במיקום j אחרי ש-X
+    (וכל מה שנדחף מעליו) נשלף. המילה מתקבלת אם קיימת מסגרת (n, q, ·) עם q מקבל.
+    מספר המסגרות O(n·|Q|·|Γ|) ומספר הסיכומים O(n²·|Q|²·|Γ|), כך שהזמן פולינומי.
+
+    מחזיר {"accepted": True/False, או None אם חרגנו מ-max_items, "frames", "items"}.
+    """
+    if pda.get("type") != "PDA":
+        return {"accepted": False, "frames": 0, "items": 0}
+    return decide_compiled(get_compiled_pda(pda), input_word, max_items)
+
+
+def decide_compiled(
+    machine: CompiledPDA,
+    input_word: str,
+    max_items: int = DEFAULT_MAX_ITEMS,
+) -> Dict[str, Any]:
+    """
+    decide_pda on an already compiled automaton (batch runs compile once).
+    """
+    word_ids = machine.input_ids(input_word)
+    n = len(input_word)
+    live = live_states(machine, word_ids)
+    if not live[0][machine.start]:
+        return {"accepted": False, "frames": 0, "items": 0}
+
+    # push sequences are interned so that items stay small int tuples
+    seq_ids: Dict[Tuple[int, ...], int] = {}
+    seqs: List[Tuple[int, ...]] = []
+
+    def seq_id(seq: Tuple[int, ...]) -> int:
+        sid = seq_ids.get(seq)
+        if sid is None:
+            sid = len(seqs)
+            seq_ids[seq] = sid
+            seqs.append(seq)
+        return sid
+
+    frames: Set[Frame] = set()
+    done: Dict[Frame, List[Tuple[int, int]]] = {}
+    done_set: Set[Tuple[Frame, int, int]] = set()
+    # frame -> items (parent frame, push sequence, symbols popped) waiting for it to be popped
+    waiting: Dict[Frame, List[Tuple[Frame, int, int]]] = {}
+    items: Set[Tuple[Frame, int, int, int, int]] = set()
+
+    # worklist entries: ("frame", frame) or ("item", parent, seq, dot, pos, state)
+    work: List[Tuple[Any, ...]] = []
+
+    # the initial stack is ⊥ Z: a root "move" that pushed both
+    root: Frame = (-1, -1, BOTTOM)
+    work.append(("item", root, seq_id((BOTTOM, machine.initial_stack)), 0, 0, machine.start))
+
+    accepted = False
+    while work:
+        if len(items) > max_items:
+            logger.warning("PDA membership for '%s' exceeded %d items", input_word, max_items)
+            return {"accepted": None, "frames": len(frames), "items": len(items)}
+
+        entry = work.pop()
+        if entry[0] == "frame":
+            frame = entry[1]
+            pos, state, top = frame
+            if pos == n and machine.accepting[state]:
+                accepted = True
+                break
+            _predict(machine, frame, word_ids, n, live, seq_id, work)
+            continue
+
+        _, parent, seq, dot, pos, state = entry
+        key = (parent, seq, dot, pos, state)
+        if key in items:
+            continue
+        items.add(key)
+
+        push = seqs[seq]
+        if dot == len(push):
+            # everything pushed by the parent's move is gone: the parent frame is popped
+            if parent == root or (parent, pos, state) in done_set:
+                continue
+            done_set.add((parent, pos, state))
+            done.setdefault(parent, []).append((pos, state))
+            for grand, gseq, gdot in list(waiting.get(parent, ())):
+                work.append(("item", grand, gseq, gdot + 1, pos, state))
+            continue
+
+        # the next pushed symbol (from the top down) becomes the top: a new frame
+        child: Frame = (pos, state, push[len(push) - 1 - dot])
+        waiting.setdefault(child, []).append((parent, seq, dot))
+        for pos2, state2 in list(done.get(child, ())):
+            work.append(("item", parent, seq, dot + 1, pos2, state2))
+        if child not in frames:
+            frames.add(child)
+            work.append(("frame", child))
+
+    logger.debug(
+        "PDA membership for '%s': %s (frames=%d, items=%d)",
+        input_word, "accept" if accepted else "reject", len(frames), len(items),
+    )
+    return {"accepted": accepted, "frames": len(frames), "items": len(items)}
+
+
+def _predict(
+    machine: CompiledPDA,
+    frame: Frame,
+    word_ids: List[int],
+    n: int,
+    live: List[bytearray],
+    seq_id: Any,
+    work: List[Tuple[Any, ...]],
+) -> None:
+    """
+    Every move possible from the frame's configuration becomes an item of the frame
+    with nothing popped yet (moves into states that cannot accept the rest of the
+    word are skipped).
+    """
+    pos, state, top = frame
+    stack_top: Optional[int] = None if top == BOTTOM else top
+
+    reads = [(EPSILON, pos)]
+    if pos < n and word_ids[pos] > EPSILON:
+        reads.append((word_ids[pos], pos + 1))
+
+    for read, next_pos in reads:
+        for to, pops, push in machine.moves(state, read, stack_top):
+            if not live[next_pos][to]:
+                continue
+            # a move that does not pop keeps the top underneath what it pushes
+            seq = push if pops else (top,) + push
+            work.append(("item", frame, seq_id(seq), 0, next_pos, to))
+
+
+# ------------------------------------------------------------
+# Batch
+# ------------------------------------------------------------
+
+# upper bound on the words of one batch (explicit or generated)
+MAX_BATCH_WORDS = 20_000
+
+
+def words_up_to(alphabet: List[str], max_length: int) -> List[str]:
+    """
+    All words over the alphabet of length 0..max_length, shortest first.
+    Raises ValueError when that would exceed MAX_BATCH_WORDS.
+    """
+    alphabet = list(dict.fromkeys(a for a in alphabet if a))
+    total = sum(len(alphabet) ** k for k in range(max_length + 1))
+    if total > MAX_BATCH_WORDS:
+        raise ValueError(f"{total} words up to length {max_length}; the limit is {MAX_BATCH_WORDS}")
+    return ["".join(w) for k in range(max_length + 1) for w in product(alphabet, repeat=k)]
+
+
+def _decide_chunk(machine: CompiledPDA, words: List[str], max_items: int) -> List[Tuple[Optional[bool], int]]:
+    results = []
+    for w in words:
+        res = decide_compiled(machine, w, max_items)
+        results.append((res["accepted"], res["frames"]))
+    return results
+
+
+def decide_pda_batch(
+    pda: Dict[str, Any],
+    words: List[str],
+    max_items: int = DEFAULT_MAX_ITEMS,
+) -> Dict[str, Any]:
+    """
+    מכריע רשימת מילים מול אוטומט מקומפל אחד (ללא Trace).
+    מחזיר רשימות מקבילות של verdicts ("accept" / "reject" / "unknown" אם חרגנו מ-max_items)
+    ו-configs (מספר הקונפיגורציות (position, state, top) שהושגו), ועוד סיכום.
+    אצוות גדולות מתחלקות בין התהליכים של ה-pool המשותף (services.batch_pool).
+    """
+    if pda.get("type") != "PDA":
+        raise ValueError("Not a PDA")
+    machine = get_compiled_pda(pda)
+    results = map_chunks(_decide_chunk, machine, words, max_items)
+
+    verdicts = ["unknown" if a is None else ("accept" if a else "reject") for a, _ in results]
+    return {
+        "words": words,
+        "verdicts": verdicts,
+        "configs": [c for _, c in results],
+        "summary": {v: verdicts.count(v) for v in ("accept", "reject", "unknown")},
+    }
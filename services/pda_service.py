@@ -4,8 +4,10 @@ import logging
 from typing import Any, Dict, List
 
 from openai import OpenAI
+from starlette.concurrency import run_in_threadpool
 
-from services.pda_simulator import run_pda
+from services.pda_membership import decide_pda
+from services.pda_simulator import search_pda
 
 logger = logging.getLogger(__name__)
 
@@ -239,18 +241,40 @@ async def generate_pda(description: str) -> Dict[str, Any]:
         }
 
 
-async def simulate_pda_word(pda: Dict[str, Any], word: str) -> Dict[str, Any]:
+def _simulate_word(pda: Dict[str, Any], word: str, strategy: str) -> Dict[str, Any]:
+    search = search_pda(pda, word, strategy=strategy)
+    trace_accepting = search["accepted"]
+    accepted, definitive = trace_accepting, True
+    # "epsilon_loop" was already decided by decide_pda's engine inside search_pda
+    if not trace_accepting and search["reason"] != "epsilon_loop":
+        verdict = decide_pda(pda, word)["accepted"]
+        if verdict is None:
+            definitive = False
+        else:
+            accepted = verdict
+    return {
+        "accepted": accepted,
+        "trace": search["trace"],
+        "definitive": definitive,
+        "trace_accepting": trace_accepting,
+        "search": search["stats"],
+    }
+
+
+async def simulate_pda_word(pda: Dict[str, Any], word: str, strategy: str = "bfs") -> Dict[str, Any]:
     """
     מריץ NPDA על מחרוזת יחידה ומחזיר:
       - accepted: האם המילה התקבלה על ידי לפחות הרצה אחת.
       - trace: Trace של אחד המסלולים (בד\"כ מסלול מקבל, אם קיים).
+      - definitive: האם התשובה ודאית (ולא תוצאה של מיצוי תקציב ה-BFS).
+      - trace_accepting: האם ה-Trace עצמו מסתיים בקבלה.
+      - search: סטטיסטיקות החיפוש (expanded, generated, max_frontier, strategy).
+    search_pda (באסטרטגיה strategy: bfs / iddfs / best_first) מספק את ה-Trace;
+    כשהוא לא מוצא מסלול מקבל, decide_pda (פולינומי ומדויק) מכריע.
+    שניהם רצים ב-threadpool, כדי לא לחסום את ה-event loop.
     """
     try:
-        accepted, trace = run_pda(pda, word)
-        return {
-            "accepted": accepted,
-            "trace": trace,
-        }
+        return await run_in_threadpool(_simulate_word, pda, word, strategy)
     except Exception as exc:
         logger.exception("Error while simulating PDA word: %s", exc)
         return {
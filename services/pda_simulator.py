@@ -1,11 +1,21 @@
 from collections import deque
-from typing import Any, Deque, Dict, List, Tuple
+from heapq import heappop, heappush
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 import logging
 
+from services.pda_analysis import has_growing_epsilon_cycle, live_states
+from services.pda_compiled import EPSILON, CompiledPDA, get_compiled_pda
+from services.pda_membership import decide_compiled
+from services.persistent_stack import StackInterner, StackNode, to_list
+
 logger = logging.getLogger(__name__)
 
 # קונפיגורציה של NPDA: מצב, מיקום בקלט, ותוכן מחסנית
-Configuration = Tuple[str, int, Tuple[str, ...]]  # (state, position in input, stack tuple)
+# המחסנית היא StackNode משותף (hash-consed), כך שהשוואה וגיבוב הם O(1)
+# מצבים וסמלי מחסנית הם מזהים שלמים של CompiledPDA
+Configuration = Tuple[int, int, Optional[StackNode]]  # (state id, position in input, stack)
+
+SEARCH_STRATEGIES = ("bfs", "iddfs", "best_first")
 
 
 def run_pda(
@@ -15,176 +25,277 @@ def run_pda(
     max_configs: int = 3000,
 ) -> Tuple[bool, List[Dict[str, Any]]]:
     """
-    סימולטור ל-NPDA עם מעברי אפסילון.
+    ממשק התאימות הישן: (accepted, trace) של search_pda(strategy="bfs").
     • מקבל PDA במבנה שנוצר על ידי _normalize_pda.
-    • מריץ חיפוש BFS על מרחב הקונפיגורציות (state, position, stack).
     • מחזיר:
         - accepted: האם קיימת הרצה שמסתיימת במצב מקבל לאחר צריכת כל הקלט.
         - trace: Trace של אחד המסלולים (אם יש מסלול מקבל, נחזיר מסלול כזה).
-    המגבלות max_steps, max_configs מגנות מפני לולאות אינסופיות והתפוצצות אי-דטרמיניזם.
+    תקציב ה-BFS הוא min(max_steps, max_configs). ה-endpoints קוראים ל-search_pda ישירות;
+    כל הלוגיקה נמצאת שם, כך שהשניים לא יכולים להתפצל.
     """
     if pda.get("type") != "PDA":
         logger.warning("run_pda called with non-PDA type: %s", pda.get("type"))
         return False, []
 
-    states: List[str] = pda.get("states", [])
-    start_state: str = pda.get("start_state", states[0] if states else "")
-    accept_states = set(pda.get("accept_states", []))
-    initial_stack_symbol: str = pda.get("initial_stack_symbol", "Z")
-
-    transitions_raw = pda.get("transitions", [])
-
-    # בניית מפה: (from_state, read_symbol) -> [transition, ...]
-    # read_symbol == "" => מעבר אפסילון
-    transitions_map: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
-    for t in transitions_raw:
-        from_state = t.get("from")
-        read_symbol = t.get("read", "")
-        if from_state is None:
-            logger.warning("Skipping transition without 'from' field: %s", t)
-            continue
-        key = (from_state, read_symbol)
-        transitions_map.setdefault(key, []).append(t)
-
-    # קונפיגורציה התחלתית
-    initial_stack: Tuple[str, ...] = (initial_stack_symbol,)
-    initial_config: Configuration = (start_state, 0, initial_stack)
-
-    # Trace התחלתית
-    initial_trace_step = {
-        "step": 0,
-        "state": start_state,
-        "consumed": "",
-        "remaining_input": input_word,
-        "stack": list(initial_stack),
-    }
-
-    queue: Deque[Tuple[Configuration, List[Dict[str, Any]]]] = deque()
-    queue.append((initial_config, [initial_trace_step]))
-
-    visited: set[Configuration] = {initial_config}
-
-    steps_processed = 0
-    configs_processed = 0
-
-    last_trace: List[Dict[str, Any]] = [initial_trace_step]
-
-    while queue and steps_processed < max_steps and configs_processed < max_configs:
-        (state, position, stack), trace = queue.popleft()
-        steps_processed += 1
-        last_trace = trace
-
-        # בדיקת קבלה – כל הקלט נצרך ואנו במצב מקבל
-        if position == len(input_word) and state in accept_states:
-            logger.info(
-                "NPDA accepted word '%s' in %d steps (configs explored: %d).",
-                input_word,
-                steps_processed,
-                configs_processed,
-            )
-            return True, trace
-
-        configs_processed += 1
-
-        stack_list = list(stack)
+    res = search_pda(pda, input_word, strategy="bfs", max_expansions=min(max_steps, max_configs))
+    return res["accepted"], res["trace"]
+
+
+def search_pda(
+    pda: Dict[str, Any],
+    input_word: str,
+    strategy: str = "bfs",
+    max_expansions: int = 20000,
+    max_depth: int = 1000,
+) -> Dict[str, Any]:
+    """
+    חיפוש ריצה מקבלת באסטרטגיה לבחירה:
+    • "bfs" – FIFO; מוצא את המסלול הקצר ביותר. תקציב: max_expansions קונפיגורציות.
+    • "iddfs" – DFS עם עומק שגדל (0, 1, 2, ... עד max_depth); זיכרון לפי עומק בלבד.
+      תקציב: max_expansions בסך כל האיטרציות.
+    • "best_first" – תור עדיפויות לפי צעדים + 2·(קלט שנותר) + עומק המחסנית: קריאת תו
+      משפרת את הציון, ודחיפה ב-ε מרעה אותו, כך שלולאות ε שמגדילות את המחסנית נדחות.
+      תקציב: max_expansions.
+
+    מחזיר accepted, reason ("accept_state" / "exhausted" = דחייה ודאית / "budget" /
+    "epsilon_loop"), trace ו-stats (expanded, generated, max_frontier, ועבור iddfs גם iterations).
+    מעברים למצבים שמהם אין מסלול מקבל על שארית הקלט (live_states) נגזמים מראש
+    (stats["pruned"]); אם כבר מצב ההתחלה כזה – דחייה מיידית.
+    אם יש לולאת ε ישיגה שמגדילה את המחסנית (pda_analysis), החיפוש לעולם לא ימצה את
+    מרחב הקונפיגורציות; לכן decide_compiled מכריע קודם, ומילה שנדחית מוחזרת מיד
+    עם reason "epsilon_loop" (דחייה ודאית) במקום למצות את התקציב.
+    """
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"strategy must be one of: {', '.join(SEARCH_STRATEGIES)}")
+    if pda.get("type") != "PDA":
+        return {"accepted": False, "reason": "exhausted", "trace": [], "stats": {"strategy": strategy}}
+
+    machine = get_compiled_pda(pda)
+    search = _Search(machine, input_word)
+    if not search.live[0][search.initial[0]]:
+        # even ignoring the stack no accepting state is reachable on this word
+        stats = {"expanded": 0, "generated": 1, "max_frontier": 1}
+        res = search._result(False, "exhausted", 0, stats)
+    elif has_growing_epsilon_cycle(machine) and decide_compiled(machine, input_word)["accepted"] is False:
+        # the search could only run out its budget pumping the cycle
+        stats = {"expanded": 0, "generated": 1, "max_frontier": 1}
+        res = search._result(False, "epsilon_loop", 0, stats)
+    elif strategy == "iddfs":
+        res = search.iddfs(max_expansions, max_depth)
+    else:
+        res = search.frontier(max_expansions, best_first=strategy == "best_first")
+    res["stats"]["pruned"] = search.pruned
+    res["stats"]["strategy"] = strategy
+
+    logger.info(
+        "NPDA %s word '%s' (%s, expanded=%d).",
+        "accepted" if res["accepted"] else "rejected",
+        input_word,
+        strategy,
+        res["stats"]["expanded"],
+    )
+    return res
+
+
+class _Search:
+    """
+    One search over a compiled PDA: arena of configurations with parent pointers,
+    shared by all strategies (iddfs resets it per iteration).
+    """
+
+    def __init__(self, machine: CompiledPDA, input_word: str):
+        self.machine = machine
+        self.input_word = input_word
+        self.word_ids = machine.input_ids(input_word)
+        # live[i][q] == 0: no accepting run from state q at position i (see pda_analysis)
+        self.live = live_states(machine, self.word_ids)
+        self.pruned = 0
+        self.interner = StackInterner()
+        self.initial: Configuration = (machine.start, 0, self.interner.from_list([machine.initial_stack]))
+        self._reset()
+
+    def _reset(self) -> None:
+        # arena: אינדקס קונפיגורציה -> (config, parent index, consumed symbol)
+        self.arena: List[Configuration] = [self.initial]
+        self.parents: List[int] = [-1]
+        self.consumed: List[str] = [""]
+
+    def _add(self, config: Configuration, parent: int, symbol: str) -> int:
+        self.arena.append(config)
+        self.parents.append(parent)
+        self.consumed.append(symbol)
+        return len(self.arena) - 1
+
+    def _is_accepting(self, config: Configuration) -> bool:
+        state, position, _ = config
+        return position == len(self.input_word) and self.machine.accepting[state]
+
+    def _successors(self, config: Configuration) -> Iterator[Tuple[Configuration, str]]:
+        state, position, stack = config
+        machine = self.machine
+        interner = self.interner
+        top = None if stack is None else stack.top
 
         # 1) מעברי אפסילון (read == "")
-        for t in transitions_map.get((state, ""), []):
-            new_state, new_position, new_stack, new_trace = _apply_transition(
-                t, state, position, stack_list, trace, input_word, epsilon=True
-            )
-            if new_state is None:
+        live = self.live[position]
+        for to, pops, push in machine.moves(state, EPSILON, top):
+            if not live[to]:
+                self.pruned += 1
                 continue
-            new_config: Configuration = (new_state, new_position, tuple(new_stack))
-            if new_config not in visited:
-                visited.add(new_config)
-                queue.append((new_config, new_trace))
+            yield (to, position, interner.push_all(stack.below if pops else stack, push)), "ε"
 
         # 2) מעברים שקוראים תו מהקלט
-        if position < len(input_word):
-            symbol = input_word[position]
-            for t in transitions_map.get((state, symbol), []):
-                new_state, new_position, new_stack, new_trace = _apply_transition(
-                    t, state, position, stack_list, trace, input_word, epsilon=False
-                )
-                if new_state is None:
+        if position < len(self.input_word) and self.word_ids[position] > EPSILON:
+            symbol = self.input_word[position]
+            live = self.live[position + 1]
+            for to, pops, push in machine.moves(state, self.word_ids[position], top):
+                if not live[to]:
+                    self.pruned += 1
                     continue
-                new_config = (new_state, new_position, tuple(new_stack))
-                if new_config not in visited:
-                    visited.add(new_config)
-                    queue.append((new_config, new_trace))
+                yield (to, position + 1, interner.push_all(stack.below if pops else stack, push)), symbol
 
-    # אם לא התקבלה מילה עד פה – דחייה
-    logger.info(
-        "NPDA rejected word '%s'. steps=%d, configs=%d",
-        input_word,
-        steps_processed,
-        configs_processed,
-    )
-    return False, last_trace
+    def _result(self, accepted: bool, reason: str, index: int, stats: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "accepted": accepted,
+            "reason": reason,
+            "trace": _build_trace(self.machine, self.arena, self.parents, self.consumed, index, self.input_word),
+            "stats": stats,
+        }
+
+    def frontier(self, max_expansions: int, best_first: bool) -> Dict[str, Any]:
+        """
+        BFS (FIFO) or best-first (heap on steps + 2 * remaining input + stack depth).
+        """
+        n = len(self.input_word)
+        visited = {self.initial}
+        queue: Deque[int] = deque([0])
+        # (score, arena index = insertion order, steps)
+        heap: List[Tuple[int, int, int]] = [(2 * n + 1, 0, 0)]
+        expanded = 0
+        max_frontier = 1
+        last_index = 0
+
+        while (heap if best_first else queue) and expanded < max_expansions:
+            if best_first:
+                _, index, steps = heappop(heap)
+            else:
+                index = queue.popleft()
+            config = self.arena[index]
+            last_index = index
+
+            # בדיקת קבלה – כל הקלט נצרך ואנו במצב מקבל
+            if self._is_accepting(config):
+                stats = {"expanded": expanded, "generated": len(self.arena), "max_frontier": max_frontier}
+                return self._result(True, "accept_state", index, stats)
+
+            expanded += 1
+            for child, symbol in self._successors(config):
+                if child in visited:
+                    continue
+                visited.add(child)
+                child_index = self._add(child, index, symbol)
+                if best_first:
+                    depth = 0 if child[2] is None else child[2].depth
+                    heappush(heap, (steps + 1 + 2 * (n - child[1]) + depth, child_index, steps + 1))
+                else:
+                    queue.append(child_index)
+            max_frontier = max(max_frontier, len(heap) if best_first else len(queue))
+
+        reason = "budget" if (heap if best_first else queue) else "exhausted"
+        stats = {"expanded": expanded, "generated": len(self.arena), "max_frontier": max_frontier}
+        return self._result(False, reason, last_index, stats)
+
+    def iddfs(self, max_expansions: int, max_depth: int) -> Dict[str, Any]:
+        """
+        Depth-limited DFS for limits 0..max_depth. Within an iteration a configuration
+        is re-entered only when reached at a smaller depth than before.
+        """
+        expanded = 0
+        generated = 0
+        max_frontier = 1
+        last_index = 0
 
+        for limit in range(max_depth + 1):
+            self._reset()
+            best_depth: Dict[Configuration, int] = {self.initial: 0}
+            stack: List[Tuple[int, int]] = [(0, 0)]
+            cut_off = False
 
-def _apply_transition(
-    t: Dict[str, Any],
-    current_state: str,
-    position: int,
-    stack_list: List[str],
-    trace: List[Dict[str, Any]],
+            while stack:
+                index, depth = stack.pop()
+                config = self.arena[index]
+                last_index = index
+
+                if self._is_accepting(config):
+                    stats = {
+                        "expanded": expanded,
+                        "generated": generated + len(self.arena),
+                        "max_frontier": max_frontier,
+                        "iterations": limit + 1,
+                    }
+                    return self._result(True, "accept_state", index, stats)
+
+                if depth == limit:
+                    cut_off = True
+                    continue
+                if expanded >= max_expansions:
+                    stats = {
+                        "expanded": expanded,
+                        "generated": generated + len(self.arena),
+                        "max_frontier": max_frontier,
+                        "iterations": limit + 1,
+                    }
+                    return self._result(False, "budget", index, stats)
+
+                expanded += 1
+                children = []
+                for child, symbol in self._successors(config):
+                    if best_depth.get(child, depth + 2) <= depth + 1:
+                        continue
+                    best_depth[child] = depth + 1
+                    children.append((self._add(child, index, symbol), depth + 1))
+                # reversed, so that the first transition in spec order is explored first
+                stack.extend(reversed(children))
+                max_frontier = max(max_frontier, len(stack))
+
+            generated += len(self.arena)
+            if not cut_off:
+                # the whole configuration space was explored within the limit
+                stats = {"expanded": expanded, "generated": generated, "max_frontier": max_frontier, "iterations": limit + 1}
+                return self._result(False, "exhausted", last_index, stats)
+
+        stats = {"expanded": expanded, "generated": generated, "max_frontier": max_frontier, "iterations": max_depth + 1}
+        return self._result(False, "budget", last_index, stats)
+
+
+def _build_trace(
+    machine: CompiledPDA,
+    arena: List[Configuration],
+    parents: List[int],
+    consumed: List[str],
+    index: int,
     input_word: str,
-    epsilon: bool,
-) -> Tuple[Any, int, List[str], List[Dict[str, Any]]]:
+) -> List[Dict[str, Any]]:
     """
-    מיישם מעבר בודד של NPDA ומחזיר:
-      new_state, new_position, new_stack, new_trace
-    אם המעבר אינו חוקי (למשל pop לא מתאים למחסנית) – יחזיר (None, ...)
+    משחזר את ה-Trace של קונפיגורציה אחת לפי מצביעי ההורה (מהשורש אליה).
     """
-    pop_symbol = t.get("pop", "")
-    push_list_raw = t.get("push", [])
-
-    # לא להרוס את המחסנית המקורית
-    new_stack = list(stack_list)
-
-    # pop == "" => לא מושכים מהמחסנית
-    if pop_symbol not in ("", "ε", None):
-        if not new_stack or new_stack[-1] != pop_symbol:
-            # המעבר לא אפשרי – אין התאמה בין pop לראש המחסנית
-            return None, position, stack_list, trace
-        new_stack.pop()
-
-    # טיפול ב-push – מתוך הנחה שזו כבר רשימה מתוקננת, אבל להיות סלחניים
-    push_list: List[str] = []
-    if isinstance(push_list_raw, list):
-        push_list = [str(s) for s in push_list_raw if str(s).strip() != "" and str(s) != "ε"]
-    elif isinstance(push_list_raw, str):
-        s = push_list_raw.strip()
-        if s not in {"", "ε"}:
-            push_list = [ch for ch in s]
-
-    # הרשימה מסודרת מלמטה למעלה → דוחפים במהופך
-    for sym in reversed(push_list):
-        new_stack.append(sym)
-
-    new_state = t.get("to", current_state)
-    if epsilon:
-        new_position = position
-        consumed_symbol = "ε"
-        remaining = input_word[position:]
-    else:
-        new_position = position + 1
-        consumed_symbol = input_word[position]
-        remaining = input_word[new_position:]
-
-    # בניית Trace חדש
-    new_trace = list(trace)
-    next_step_index = (trace[-1]["step"] + 1) if trace else 1
-    new_trace.append(
-        {
-            "step": next_step_index,
-            "state": new_state,
-            "consumed": consumed_symbol,
-            "remaining_input": remaining,
-            "stack": list(new_stack),
-        }
-    )
+    path: List[int] = []
+    while index != -1:
+        path.append(index)
+        index = parents[index]
+    path.reverse()
 
-    return new_state, new_position, new_stack, new_trace
+    symbols = machine.stack_symbols
+    trace: List[Dict[str, Any]] = []
+    for step, i in enumerate(path):
+        state, position, stack = arena[i]
+        trace.append(
+            {
+                "step": step,
+                "state": machine.states[state],
+                "consumed": consumed[i],
+                "remaining_input": input_word[position:],
+                "stack": [symbols[s] for s in to_list(stack)],
+            }
+        )
+    return trace
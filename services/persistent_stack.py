@@ -0,0 +1,78 @@
+# services/persistent_stack.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class StackNode:
+    """
+    Immutable cons cell: `top` on top of `below`.
+
+    Nodes are only created through a StackInterner, which hash-conses them:
+    equal stacks are the *same* object, so equality and hashing are O(1)
+    (identity) and siblings share every common suffix.
+    """
+
+    __slots__ = ("top", "below", "depth")
+
+    def __init__(self, top: Any, below: Optional["StackNode"]):
+        self.top = top
+        self.below = below
+        self.depth: int = 1 if below is None else below.depth + 1
+
+    def __iter__(self):
+        node: Optional[StackNode] = self
+        while node is not None:
+            yield node.top
+            node = node.below
+
+    def __repr__(self) -> str:
+        return f"StackNode({to_list(self)!r})"
+
+
+class StackInterner:
+    """
+    Hash-consing table for StackNode. One interner per run keeps the table's
+    lifetime bounded by the run (nothing global grows).
+    """
+
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells: Dict[Tuple[Any, int], StackNode] = {}
+
+    def push(self, below: Optional[StackNode], symbol: Any) -> StackNode:
+        # `below` is itself interned and kept alive by the table, so its id is a stable key
+        key = (symbol, id(below))
+        node = self._cells.get(key)
+        if node is None:
+            node = StackNode(symbol, below)
+            self._cells[key] = node
+        return node
+
+    def push_all(self, below: Optional[StackNode], symbols: Iterable[Any]) -> Optional[StackNode]:
+        """
+        Pushes symbols in order (the last one ends up on top).
+        """
+        node = below
+        for sym in symbols:
+            node = self.push(node, sym)
+        return node
+
+    def from_list(self, items: Iterable[Any]) -> Optional[StackNode]:
+        """
+        Builds a stack from a bottom-to-top list.
+        """
+        return self.push_all(None, items)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+
+def to_list(node: Optional[StackNode]) -> List[Any]:
+    """
+    Bottom-to-top list (the API representation of a stack).
+    """
+    if node is None:
+        return []
+    items = list(node)
+    items.reverse()
+    return items
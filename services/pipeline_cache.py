@@ -0,0 +1,162 @@
+# services/pipeline_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Optional
+
+from services.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX = int(os.getenv("PIPELINE_CACHE_MAX", "2000"))
+CACHE_TTL_SEC = float(os.getenv("PIPELINE_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("PIPELINE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# on-disk level: the user cache directory by default (outside the source tree);
+# PIPELINE_CACHE_PATH="" keeps the cache in memory only
+_CACHE_HOME = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache")
+CACHE_PATH = os.getenv("PIPELINE_CACHE_PATH", str(_CACHE_HOME / "automata" / "pipeline_cache.sqlite3"))
+CACHE_DISK_MAX_BYTES = int(os.getenv("PIPELINE_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def normalize_description(description: str) -> str:
+    """
+    Unicode NFC and collapsed whitespace, so that trivially different spellings
+    of the same request share one entry. Case and punctuation are kept: they
+    are significant in alphabets and regexes ({A,B} vs {a,b}, "(a|b)." vs "(a|b)").
+    """
+    text = unicodedata.normalize("NFC", description)
+    return " ".join(text.split())
+
+
+def cache_key(stage: str, description: str) -> str:
+    return hashlib.sha256(f"{stage}\0{normalize_description(description)}".encode("utf-8")).hexdigest()
+
+
+class PipelineCache:
+    """
+    Content-addressed cache of pipeline stage results (JSON values), keyed by
+    stage + normalised description:
+
+    - level 1: in-process SessionStore (LRU, TTL, byte limit)
+    - level 2 (unless the path is empty): SQLite file that survives restarts;
+      rows expire after the TTL and the least recently used ones are deleted
+      beyond max_disk_bytes
+
+    Disk errors are logged and the cache degrades to memory only.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_disk_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: SessionStore[str] = SessionStore(
+            max_entries=CACHE_MAX,
+            ttl_seconds=ttl_seconds,
+            max_bytes=CACHE_MAX_BYTES,
+            sizeof=lambda value: 256 + len(value),
+        )
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_ok = bool(path)
+
+    def get(self, stage: str, description: str) -> Optional[Any]:
+        key = cache_key(stage, description)
+        raw = self._memory.get(key)
+        if raw is None:
+            raw = self._disk_get(key)
+            if raw is None:
+                return None
+            self._memory.put(raw, key=key)
+        logger.info("Pipeline cache hit: %s", stage)
+        return json.loads(raw)
+
+    def put(self, stage: str, description: str, value: Any) -> None:
+        key = cache_key(stage, description)
+        raw = json.dumps(value, ensure_ascii=False)
+        self._memory.put(raw, key=key)
+        self._disk_put(key, stage, raw)
+
+    # --------------------------------------------------------
+    # disk level
+    # --------------------------------------------------------
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self._disk_ok:
+            try:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    " key TEXT PRIMARY KEY, stage TEXT, value TEXT,"
+                    " size INTEGER, created REAL, accessed REAL)"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+                db.commit()
+                self._db = db
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning("Pipeline cache: disk level disabled (%s)", exc)
+                self._disk_ok = False
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return None
+            try:
+                row = db.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if now - row[1] > self.ttl_seconds:
+                    db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    db.commit()
+                    return None
+                db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                db.commit()
+                return row[0]
+            except sqlite3.Error as exc:
+                logger.warning("Pipeline cache read failed: %s", exc)
+                return None
+
+    def _disk_put(self, key: str, stage: str, raw: str) -> None:
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                now = time.time()
+                db.execute(
+                    "INSERT OR REPLACE INTO cache (key, stage, value, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, stage, raw, len(raw.encode("utf-8")), now, now),
+                )
+                self._evict(db, now)
+                db.commit()
+            except sqlite3.Error as exc:
+                logger.warning("Pipeline cache write failed: %s", exc)
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl_seconds,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # drop least recently used rows until the table fits again
+        excess = total - self.max_disk_bytes
+        freed = 0
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        db.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+
+pipeline_cache = PipelineCache(CACHE_PATH, CACHE_TTL_SEC, CACHE_DISK_MAX_BYTES)
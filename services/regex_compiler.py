@@ -0,0 +1,234 @@
+# services/regex_compiler.py
+"""
+Small regex → NFA (Thompson) → DFA (subset construction) compiler for
+alphabets of single-character symbols.
+
+Syntax: concatenation, `|`, `*`, `+`, `?`, parentheses, `ε` (the empty
+word), `.` (any alphabet symbol) and `[abc]` (one of the listed symbols).
+Whitespace is ignored. The result is a DFA dict in the validate_and_fix_dfa
+format, total over the alphabet.
+
+Patterns come from users and from the model, so the compiler is bounded:
+pattern length, parenthesis nesting, NFA size and DFA size all have caps,
+and exceeding one raises RegexError like any other bad pattern.
+"""
+from typing import Any, Dict, FrozenSet, List, Set, Tuple
+
+# AST nodes: ("sym", frozenset of symbols), ("eps",), ("cat", a, b), ("alt", a, b), ("star", a)
+Node = Tuple[Any, ...]
+
+# the parser and the Thompson build recurse once per nesting level / concatenated piece
+MAX_PATTERN_LENGTH = 300
+MAX_NESTING = 50
+# "+" copies its operand, so nested "+" can blow the NFA up exponentially
+MAX_NFA_STATES = 20000
+# subset construction is exponential in the worst case ((0|1)*1(0|1)^k has 2^(k+1) states)
+MAX_DFA_STATES = 4096
+
+
+class RegexError(ValueError):
+    pass
+
+
+class _Parser:
+    def __init__(self, pattern: str, alphabet: List[str]):
+        self.tokens = [ch for ch in pattern if not ch.isspace()]
+        if len(self.tokens) > MAX_PATTERN_LENGTH:
+            raise RegexError(f"pattern longer than {MAX_PATTERN_LENGTH} symbols")
+        self.pos = 0
+        self.depth = 0
+        self.alphabet = alphabet
+
+    def parse(self) -> Node:
+        node = self._alt()
+        if self.pos != len(self.tokens):
+            raise RegexError(f"unexpected '{self.tokens[self.pos]}' at {self.pos}")
+        return node
+
+    def _peek(self) -> str:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ""
+
+    def _alt(self) -> Node:
+        node = self._cat()
+        while self._peek() == "|":
+            self.pos += 1
+            node = ("alt", node, self._cat())
+        return node
+
+    def _cat(self) -> Node:
+        node: Node = ("eps",)
+        first = True
+        while self._peek() not in ("", "|", ")"):
+            part = self._repeat()
+            node = part if first else ("cat", node, part)
+            first = False
+        return node
+
+    def _repeat(self) -> Node:
+        node = self._atom()
+        while self._peek() in ("*", "+", "?"):
+            op = self.tokens[self.pos]
+            self.pos += 1
+            if op == "*":
+                node = ("star", node)
+            elif op == "+":
+                node = ("cat", node, ("star", node))
+            else:
+                node = ("alt", node, ("eps",))
+        return node
+
+    def _atom(self) -> Node:
+        ch = self._peek()
+        self.pos += 1
+        if ch == "(":
+            self.depth += 1
+            if self.depth > MAX_NESTING:
+                raise RegexError(f"parentheses nested deeper than {MAX_NESTING}")
+            node = self._alt()
+            if self._peek() != ")":
+                raise RegexError("missing ')'")
+            self.pos += 1
+            self.depth -= 1
+            return node
+        if ch == "[":
+            symbols = set()
+            while self._peek() not in ("]", ""):
+                symbols.add(self._symbol(self.tokens[self.pos]))
+                self.pos += 1
+            if self._peek() != "]":
+                raise RegexError("missing ']'")
+            self.pos += 1
+            return ("sym", frozenset(symbols))
+        if ch == "ε":
+            return ("eps",)
+        if ch == ".":
+            return ("sym", frozenset(self.alphabet))
+        if ch in ("*", "+", "?", ")", "|", "]"):
+            raise RegexError(f"unexpected '{ch}' at {self.pos - 1}")
+        return ("sym", frozenset([self._symbol(ch)]))
+
+    def _symbol(self, ch: str) -> str:
+        if ch not in self.alphabet:
+            raise RegexError(f"symbol '{ch}' is not in the alphabet")
+        return ch
+
+
+class NFA:
+    """
+    Thompson NFA: one start and one accept state; eps[s] and edges[s] = [(symbols, to)].
+    """
+
+    def __init__(self) -> None:
+        self.eps: List[List[int]] = []
+        self.edges: List[List[Tuple[FrozenSet[str], int]]] = []
+        self.start = 0
+        self.accept = 0
+
+    def new_state(self) -> int:
+        if len(self.eps) >= MAX_NFA_STATES:
+            raise RegexError(f"NFA larger than {MAX_NFA_STATES} states")
+        self.eps.append([])
+        self.edges.append([])
+        return len(self.eps) - 1
+
+    def closure(self, states: Set[int]) -> FrozenSet[int]:
+        seen = set(states)
+        stack = list(states)
+        while stack:
+            for nxt in self.eps[stack.pop()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return frozenset(seen)
+
+    def step(self, states: FrozenSet[int], symbol: str) -> FrozenSet[int]:
+        return self.closure({to for s in states for syms, to in self.edges[s] if symbol in syms})
+
+
+def regex_to_nfa(pattern: str, alphabet: List[str]) -> NFA:
+    alphabet = [a for a in dict.fromkeys(alphabet) if len(a) == 1]
+    ast = _Parser(pattern, alphabet).parse()
+    nfa = NFA()
+    nfa.start, nfa.accept = _build(nfa, ast)
+    return nfa
+
+
+def _build(nfa: NFA, node: Node) -> Tuple[int, int]:
+    """
+    Thompson construction; returns the fragment's (start, accept) states.
+    """
+    kind = node[0]
+    start = nfa.new_state()
+    if kind == "eps":
+        accept = nfa.new_state()
+        nfa.eps[start].append(accept)
+    elif kind == "sym":
+        accept = nfa.new_state()
+        nfa.edges[start].append((node[1], accept))
+    elif kind == "cat":
+        s1, a1 = _build(nfa, node[1])
+        s2, a2 = _build(nfa, node[2])
+        nfa.eps[start].append(s1)
+        nfa.eps[a1].append(s2)
+        accept = a2
+    elif kind == "alt":
+        s1, a1 = _build(nfa, node[1])
+        s2, a2 = _build(nfa, node[2])
+        accept = nfa.new_state()
+        nfa.eps[start] += [s1, s2]
+        nfa.eps[a1].append(accept)
+        nfa.eps[a2].append(accept)
+    else:  # star
+        s1, a1 = _build(nfa, node[1])
+        accept = nfa.new_state()
+        nfa.eps[start] += [s1, accept]
+        nfa.eps[a1] += [s1, accept]
+    return start, accept
+
+
+def nfa_to_dfa(nfa: NFA, alphabet: List[str]) -> Dict[str, Any]:
+    """
+    Subset construction over the reachable subsets. The empty subset, if
+    reached, becomes an ordinary rejecting sink, so the DFA is total.
+    """
+    alphabet = [a for a in dict.fromkeys(alphabet) if len(a) == 1]
+    start = nfa.closure({nfa.start})
+    ids: Dict[FrozenSet[int], int] = {start: 0}
+    order = [start]
+    transitions: Dict[str, Dict[str, str]] = {}
+
+    i = 0
+    while i < len(order):
+        subset = order[i]
+        row = {}
+        for symbol in alphabet:
+            target = nfa.step(subset, symbol)
+            if target not in ids:
+                if len(order) >= MAX_DFA_STATES:
+                    raise RegexError(f"DFA larger than {MAX_DFA_STATES} states")
+                ids[target] = len(order)
+                order.append(target)
+            row[symbol] = f"q{ids[target]}"
+        transitions[f"q{i}"] = row
+        i += 1
+
+    return {
+        "type": "DFA",
+        "alphabet": alphabet,
+        "states": [f"q{i}" for i in range(len(order))],
+        "start_state": "q0",
+        "accept_states": [f"q{i}" for i, subset in enumerate(order) if nfa.accept in subset],
+        "transitions": transitions,
+    }
+
+
+def compile_regex(pattern: str, alphabet: List[str]) -> Dict[str, Any]:
+    """
+    regex → DFA dict. Raises RegexError (a ValueError) on bad syntax,
+    symbols outside the alphabet, or a pattern over the size caps.
+    """
+    try:
+        return nfa_to_dfa(regex_to_nfa(pattern, alphabet), alphabet)
+    except RecursionError as e:
+        # the caps keep recursion shallow; this is only a safety net
+        raise RegexError("pattern nested too deeply") from e
@@ -0,0 +1,125 @@
+# services/session_store.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class SessionStore(Generic[V]):
+    """
+    Bounded in-process store: LRU order, TTL expiry and approximate memory accounting.
+
+    - every get() refreshes both the LRU position and the TTL
+    - entries are evicted oldest-first when max_entries or max_bytes is exceeded
+    - sizeof(value) is re-evaluated on put() and resize(), so callers that mutate
+      a stored value in place should call resize() afterwards
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        max_bytes: int,
+        sizeof: Callable[[V], int],
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        # key -> (value, size, last_access)
+        self._items: "OrderedDict[str, Tuple[V, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def put(self, value: V, key: Optional[str] = None) -> str:
+        key = key or uuid.uuid4().hex
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size, time.monotonic())
+            self._bytes += size
+            self._evict()
+        return key
+
+    def get(self, key: str) -> Optional[V]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, size, last = item
+            now = time.monotonic()
+            if now - last > self.ttl_seconds:
+                self._drop(key)
+                return None
+            self._items[key] = (value, size, now)
+            self._items.move_to_end(key)
+            return value
+
+    def peek(self, key: str) -> Optional[V]:
+        """
+        Like get(), but leaves the LRU position and the TTL alone.
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or time.monotonic() - item[2] > self.ttl_seconds:
+                return None
+            return item[0]
+
+    def resize(self, key: str) -> None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return
+            value, size, last = item
+            new_size = self._sizeof(value)
+            self._items[key] = (value, new_size, last)
+            self._bytes += new_size - size
+            self._evict()
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._items:
+                return False
+            self._drop(key)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "evictions": self._evictions,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    # --------------------------------------------------------
+    # internals (caller holds the lock)
+    # --------------------------------------------------------
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._items.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # expired entries first (LRU order == access order, so stop at the first fresh one)
+        while self._items:
+            key, (_, _, last) = next(iter(self._items.items()))
+            if now - last <= self.ttl_seconds:
+                break
+            self._drop(key)
+            self._evictions += 1
+
+        # then capacity; always keep the most recent entry
+        while len(self._items) > 1 and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._items))
+            self._drop(key)
+            self._evictions += 1
@@ -1,8 +1,16 @@
 # services/tm_language_library.py
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.tm_simulator import CompiledTM, TMSpecError, compile_tm
+
+logger = logging.getLogger(__name__)
+
+# step budget for precomputing verdicts on the example words
+EXAMPLE_MAX_STEPS = 20_000
 
 
 @dataclass(frozen=True)
@@ -16,6 +24,26 @@ class TMLanguage:
     spec: Dict[str, Any]
 
 
+@dataclass(frozen=True)
+class CompiledLanguage:
+    language: TMLanguage
+    machine: Optional[CompiledTM]
+    error: Optional[str] = None
+    # word -> (verdict, steps) for every example word
+    verdicts: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+
+    @property
+    def valid(self) -> bool:
+        return self.machine is not None
+
+    @property
+    def mismatches(self) -> List[str]:
+        l = self.language
+        return [w for w in l.examples_accept if self.verdicts.get(w, ("",))[0] != "accept"] + [
+            w for w in l.examples_reject if self.verdicts.get(w, ("",))[0] == "accept"
+        ]
+
+
 def _spec_only_as() -> Dict[str, Any]:
     # L = { a* } over alphabet {a,b}. Accepts empty.
     return {
@@ -110,6 +138,45 @@ def _spec_anbn() -> Dict[str, Any]:
     }
 
 
+def _spec_anbn_2tape() -> Dict[str, Any]:
+    # L = { a^n b^n | n>=1 } with 2 tapes, O(n) steps.
+    # Strategy:
+    # 1) Copy every a onto tape 2 as X
+    # 2) On the first b, step tape 2 back onto the last X
+    # 3) For every b, move tape 2 one X to the left
+    # 4) Accept when input and X's run out together
+    return {
+        "type": "TM",
+        "tapes": 2,
+        "states": ["qS", "q0", "q1", "qa", "qr"],
+        "input_alphabet": ["a", "b"],
+        "tape_alphabet": ["a", "b", "X", "_"],
+        "blank": "_",
+        "start_state": "qS",
+        "accept_states": ["qa"],
+        "reject_states": ["qr"],
+        "transitions": [
+            # qS: enforce n>=1
+            {"from": "qS", "read": ["a", "_"], "to": "q0", "write": ["a", "_"], "move": ["S", "S"]},
+            {"from": "qS", "read": ["b", "_"], "to": "qr", "write": ["b", "_"], "move": ["S", "S"]},
+            {"from": "qS", "read": ["_", "_"], "to": "qr", "write": ["_", "_"], "move": ["S", "S"]},
+
+            # q0: copy a's to tape 2
+            {"from": "q0", "read": ["a", "_"], "to": "q0", "write": ["a", "X"], "move": ["R", "R"]},
+            {"from": "q0", "read": ["b", "_"], "to": "q1", "write": ["b", "_"], "move": ["S", "L"]},
+            {"from": "q0", "read": ["_", "_"], "to": "qr", "write": ["_", "_"], "move": ["S", "S"]},
+
+            # q1: match each b with one X
+            {"from": "q1", "read": ["b", "X"], "to": "q1", "write": ["b", "X"], "move": ["R", "L"]},
+            {"from": "q1", "read": ["_", "_"], "to": "qa", "write": ["_", "_"], "move": ["S", "S"]},
+            {"from": "q1", "read": ["b", "_"], "to": "qr", "write": ["b", "_"], "move": ["S", "S"]},
+            {"from": "q1", "read": ["_", "X"], "to": "qr", "write": ["_", "X"], "move": ["S", "S"]},
+            {"from": "q1", "read": ["a", "X"], "to": "qr", "write": ["a", "X"], "move": ["S", "S"]},
+            {"from": "q1", "read": ["a", "_"], "to": "qr", "write": ["a", "_"], "move": ["S", "S"]},
+        ],
+    }
+
+
 def _spec_anbncn() -> Dict[str, Any]:
     # L = { a^n b^n c^n | n>=1 } (NOT CFL).
     # Strategy:
@@ -210,6 +277,15 @@ _LANGUAGES: List[TMLanguage] = [
         examples_reject=["", "abb", "aab", "ba", "aabbb"],
         spec=_spec_anbn(),
     ),
+    TMLanguage(
+        id="anbn_2tape",
+        title="L = a^n b^n (n≥1) — שני סרטים",
+        description="אותה שפה כמו a^n b^n, אבל עם סרט עזר: ה-a-ים מועתקים לסרט השני ונמחקים מולו אחד-אחד, כך שמספר הצעדים לינארי ולא ריבועי.",
+        alphabet_hint="Σ = {a,b}",
+        examples_accept=["ab", "aabb", "aaabbb"],
+        examples_reject=["", "abb", "aab", "ba", "aabbb", "abab"],
+        spec=_spec_anbn_2tape(),
+    ),
     TMLanguage(
         id="anbncn",
         title="L = a^n b^n c^n (n≥1) — TM כן, PDA לא",
@@ -241,3 +317,59 @@ def get_language(language_id: str) -> TMLanguage:
         if l.id == language_id:
             return l
     raise ValueError(f"Unknown language_id: {language_id}")
+
+
+_COMPILED: Dict[str, CompiledLanguage] = {}
+
+
+def _compile_language(l: TMLanguage) -> CompiledLanguage:
+    try:
+        machine = compile_tm(l.spec)
+    except TMSpecError as e:
+        logger.error("Built-in TM '%s' is invalid: %s", l.id, e)
+        return CompiledLanguage(language=l, machine=None, error=str(e))
+
+    verdicts = {
+        w: machine.decide(w, max_steps=EXAMPLE_MAX_STEPS)
+        for w in dict.fromkeys(l.examples_accept + l.examples_reject)
+    }
+    compiled = CompiledLanguage(language=l, machine=machine, verdicts=verdicts)
+    if compiled.mismatches:
+        logger.warning("Built-in TM '%s' disagrees with its examples: %s", l.id, compiled.mismatches)
+    return compiled
+
+
+def load_compiled_library() -> Dict[str, CompiledLanguage]:
+    """
+    Validates and compiles every built-in language once (idempotent; call at startup).
+    """
+    if not _COMPILED:
+        for l in _LANGUAGES:
+            _COMPILED[l.id] = _compile_language(l)
+        logger.info("TM library compiled: %d languages", len(_COMPILED))
+    return _COMPILED
+
+
+def get_compiled_language(language_id: str) -> CompiledLanguage:
+    compiled = load_compiled_library().get(language_id)
+    if compiled is None:
+        raise ValueError(f"Unknown language_id: {language_id}")
+    return compiled
+
+
+def list_compiled_languages() -> List[Dict[str, Any]]:
+    """
+    list_languages() plus validation status and the precomputed example verdicts.
+    """
+    library = load_compiled_library()
+    result = []
+    for item in list_languages():
+        compiled = library[item["id"]]
+        result.append({
+            **item,
+            "valid": compiled.valid,
+            "error": compiled.error,
+            "verdicts": {w: {"verdict": v, "steps": n} for w, (v, n) in compiled.verdicts.items()},
+            "mismatches": compiled.mismatches,
+        })
+    return result
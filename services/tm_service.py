@@ -42,7 +42,7 @@ def _extract_json(text: str) -> Dict[str, Any]:
 
 def _build_prompts(language_description: str, alphabet_hint: str | None) -> Tuple[str, str]:
     system_prompt = (
-        "You are an expert in Turing Machines (single-tape deterministic TM) and formal languages. "
+        "You are an expert in Turing Machines (deterministic, single- or multi-tape) and formal languages. "
         "Think internally in ENGLISH. "
         "Return ONLY valid JSON. No markdown. No code fences.\n\n"
         "Goal: Build a deterministic TM specification that DECIDES the language described by the user.\n\n"
@@ -61,14 +61,17 @@ def _build_prompts(language_description: str, alphabet_hint: str | None) -> Tupl
         "- Deterministic: for each (from, read) at most one transition.\n"
         "- All read/write symbols must be single characters and in tape_alphabet.\n"
         "- Keep the machine SMALL and DEMO-friendly.\n"
-        "- If the language description is unclear / non-decidable / requires multi-tape, return type='none' with a Hebrew explanation.\n\n"
+        "- Prefer a single tape. You MAY use up to 4 tapes when it makes the machine much simpler or faster: "
+        "then add tapes: k, and read/write/move in every transition become lists of length k (one entry per tape). "
+        "The input starts on the first tape; the other tapes start blank.\n"
+        "- If the language description is unclear / non-decidable, return type='none' with a Hebrew explanation.\n\n"
         "Also include (optional) extra fields for UI:\n"
         "- explanation_he: short Hebrew explanation\n"
         "- examples: { accepted: [...], rejected: [...] }\n"
     )
 
     user_prompt = (
-        "Build a deterministic single-tape TM that decides the following language.\n\n"
+        "Build a deterministic TM that decides the following language.\n\n"
         f"Language description (natural language):\n\"{language_description.strip()}\"\n\n"
     )
     if alphabet_hint and alphabet_hint.strip():
@@ -0,0 +1,122 @@
+# services/tm_session_service.py
+import hashlib
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, Tuple, Union
+
+from services.session_store import SessionStore
+from services.tm_simulator import CompiledTM, TMMultiRunState, TMRunState, TMSpecError, compile_tm
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX = int(os.getenv("TM_SESSION_MAX", "2000"))
+SESSION_TTL_SEC = float(os.getenv("TM_SESSION_TTL_SEC", "1800"))
+SESSION_MAX_BYTES = int(os.getenv("TM_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# rough per-cell cost of the compiled table used for memory accounting (CPython, 64-bit)
+_TABLE_CELL_BYTES = 8
+
+
+class TMSession:
+    """
+    A compiled machine (and its key in _machines) plus one mutable run on it.
+    """
+
+    __slots__ = ("machine", "machine_key", "run")
+
+    def __init__(self, machine: CompiledTM, machine_key: str, run: Union[TMRunState, TMMultiRunState]):
+        self.machine = machine
+        self.machine_key = machine_key
+        self.run = run
+
+
+def _machine_bytes(machine: CompiledTM) -> int:
+    return sys.getsizeof(machine.table) + len(machine.table) * _TABLE_CELL_BYTES
+
+
+def _session_bytes(session: TMSession) -> int:
+    # while _machines holds the machine it is shared and charged there; once evicted,
+    # the session alone keeps it alive, so it is charged here (re-checked on every step)
+    size = 256 + session.run.nbytes
+    if _machines.peek(session.machine_key) is not session.machine:
+        size += _machine_bytes(session.machine)
+    return size
+
+
+_machines: SessionStore[CompiledTM] = SessionStore(
+    max_entries=256,
+    ttl_seconds=SESSION_TTL_SEC,
+    max_bytes=SESSION_MAX_BYTES // 4,
+    sizeof=_machine_bytes,
+)
+_sessions: SessionStore[TMSession] = SessionStore(
+    max_entries=SESSION_MAX,
+    ttl_seconds=SESSION_TTL_SEC,
+    max_bytes=SESSION_MAX_BYTES,
+    sizeof=_session_bytes,
+)
+
+
+def _spec_key(spec: Dict[str, Any]) -> str:
+    canonical = json.dumps(spec, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_compiled(spec: Dict[str, Any]) -> CompiledTM:
+    """
+    Compiles a spec, reusing an earlier compilation of an identical spec
+    (a whole class usually runs the same machine).
+    """
+    return _get_compiled(_spec_key(spec), spec)
+
+
+def _get_compiled(key: str, spec: Dict[str, Any]) -> CompiledTM:
+    machine = _machines.get(key)
+    if machine is None:
+        machine = compile_tm(spec)
+        _machines.put(machine, key=key)
+    return machine
+
+
+def create_session(spec: Dict[str, Any], input_str: str) -> Tuple[str, TMSession]:
+    key = _spec_key(spec)
+    machine = _get_compiled(key, spec)
+    session = TMSession(machine, key, machine.start_run(input_str))
+    session_id = _sessions.put(session)
+    logger.info("TM session created: %s", session_id)
+    return session_id, session
+
+
+def step_session(session_id: str, n: int = 1, window_radius: int = 12) -> Dict[str, Any]:
+    """
+    Advances a session by up to n steps in place and returns only the small
+    per-step fields (no spec, no tape). Raises TMSpecError for unknown/expired ids.
+    """
+    session = _sessions.get(session_id)
+    if session is None:
+        raise TMSpecError("session not found or expired")
+
+    machine, run = session.machine, session.run
+    res = machine.advance(run, n)
+    _sessions.resize(session_id)
+
+    out = {
+        **res,
+        "state": machine.states[run.state],
+        "head": run.head,
+        "step": run.step,
+        "window": machine.window_of(run, window_radius),
+    }
+    if machine.k > 1:
+        out["windows"] = machine.windows_of(run, window_radius)
+    return out
+
+
+def close_session(session_id: str) -> bool:
+    return _sessions.delete(session_id)
+
+
+def session_stats() -> Dict[str, Any]:
+    return {"sessions": _sessions.stats(), "machines": _machines.stats()}
@@ -1,30 +1,32 @@
 import logging
-from dataclasses import dataclass
-from typing import Dict, Tuple, List, Optional, Any
-
-logger = logging.getLogger(__name__)
+from typing import Callable, Dict, Iterator, Tuple, List, Optional, Any
 
+from services.batch_pool import map_chunks
 
-@dataclass
-class Transition:
-    to: str
-    write: str
-    move: str  # "L" | "R" | "S"
+logger = logging.getLogger(__name__)
 
 
 class TMSpecError(ValueError):
     pass
 
 
+_MOVE_DELTA = {"L": -1, "R": 1, "S": 0}
+_DELTA_MOVE = {-1: "L", 1: "R", 0: "S"}
+
+# multi-tape specs ("tapes": k) read/write/move lists of length k
+MAX_TAPES = 4
+
+
 def _normalize_symbol(s: Optional[str]) -> str:
     if s is None or s == "":
         return ""
     return s
 
 
-def validate_tm_spec(spec: Dict[str, Any]) -> None:
+def validate_tm_spec(spec: Dict[str, Any], allow_nondeterminism: bool = False) -> None:
     """
     Validates a TM spec dict. Raises TMSpecError on invalid spec.
+    With allow_nondeterminism, several transitions may share a (from, read) key (NTM).
     """
     try:
         if spec.get("type") != "TM":
@@ -57,35 +59,49 @@ def validate_tm_spec(spec: Dict[str, Any]) -> None:
         if not isinstance(transitions, list):
             raise TMSpecError("transitions must be a list")
 
-        seen: set[Tuple[str, str]] = set()
+        tapes = spec.get("tapes", 1)
+        if isinstance(tapes, bool) or not isinstance(tapes, int) or not 1 <= tapes <= MAX_TAPES:
+            raise TMSpecError(f"tapes must be an integer between 1 and {MAX_TAPES}")
+
+        seen: set[Tuple[str, Tuple[str, ...]]] = set()
         for t in transitions:
             frm = t.get("from")
-            read = _normalize_symbol(t.get("read"))
             to = t.get("to")
-            write = _normalize_symbol(t.get("write"))
-            move = t.get("move")
 
             if frm not in states:
                 raise TMSpecError(f"transition.from '{frm}' not in states")
             if to not in states:
                 raise TMSpecError(f"transition.to '{to}' not in states")
 
-            if not isinstance(read, str) or len(read) != 1:
-                raise TMSpecError(f"transition.read must be 1 char, got '{read}'")
-            if not isinstance(write, str) or len(write) != 1:
-                raise TMSpecError(f"transition.write must be 1 char, got '{write}'")
-
-            if read not in tape_alphabet:
-                raise TMSpecError(f"transition.read '{read}' not in tape_alphabet")
-            if write not in tape_alphabet:
-                raise TMSpecError(f"transition.write '{write}' not in tape_alphabet")
+            if tapes == 1:
+                reads = [_normalize_symbol(t.get("read"))]
+                writes = [_normalize_symbol(t.get("write"))]
+                moves = [t.get("move")]
+            else:
+                reads, writes, moves = t.get("read"), t.get("write"), t.get("move")
+                for field_name, value in (("read", reads), ("write", writes), ("move", moves)):
+                    if not isinstance(value, list) or len(value) != tapes:
+                        raise TMSpecError(f"transition.{field_name} must be a list of {tapes} entries (one per tape)")
+                reads = [_normalize_symbol(r) for r in reads]
+                writes = [_normalize_symbol(w) for w in writes]
 
-            if move not in ("L", "R", "S"):
-                raise TMSpecError("transition.move must be one of: L, R, S")
+            for read in reads:
+                if not isinstance(read, str) or len(read) != 1:
+                    raise TMSpecError(f"transition.read must be 1 char, got '{read}'")
+                if read not in tape_alphabet:
+                    raise TMSpecError(f"transition.read '{read}' not in tape_alphabet")
+            for write in writes:
+                if not isinstance(write, str) or len(write) != 1:
+                    raise TMSpecError(f"transition.write must be 1 char, got '{write}'")
+                if write not in tape_alphabet:
+                    raise TMSpecError(f"transition.write '{write}' not in tape_alphabet")
+            for move in moves:
+                if move not in ("L", "R", "S"):
+                    raise TMSpecError("transition.move must be one of: L, R, S")
 
-            key = (frm, read)
-            if key in seen:
-                raise TMSpecError(f"non-deterministic transition found for ({frm}, {read})")
+            key = (frm, tuple(reads))
+            if key in seen and not allow_nondeterminism:
+                raise TMSpecError(f"non-deterministic transition found for ({frm}, {','.join(reads)})")
             seen.add(key)
 
         # Optional: ensure accept/reject sets subset
@@ -100,17 +116,142 @@ def validate_tm_spec(spec: Dict[str, Any]) -> None:
         raise TMSpecError(f"Invalid TM spec: {e}") from e
 
 
-def build_transition_map(spec: Dict[str, Any]) -> Dict[Tuple[str, str], Transition]:
-    transition_map: Dict[Tuple[str, str], Transition] = {}
-    for t in (spec.get("transitions") or []):
-        frm = t["from"]
-        read = t["read"]
-        transition_map[(frm, read)] = Transition(
-            to=t["to"],
-            write=t["write"],
-            move=t["move"]
-        )
-    return transition_map
+# tape cells are bytes, so a machine may use at most this many distinct symbols
+# (including blank and any foreign input characters)
+MAX_SYMBOLS = 256
+# client-supplied configs may not place the head further than this from the tape content
+MAX_TAPE_SPAN = 1 << 20
+# upper bound on the dense multi-tape table (states * (symbols+1)**tapes cells)
+MAX_MULTI_TABLE = 1 << 20
+
+
+class Tape:
+    """
+    Two-way infinite tape backed by one contiguous bytearray of symbol ids.
+
+    - id 0 is always the blank, so freshly grown cells are blank for free
+    - tape position p lives at cells[p + origin]; growing left shifts origin
+    - `symbols` maps ids back to characters; characters outside the machine's
+      alphabet are interned on demand (no transition reads them, so a compiled
+      machine simply gets stuck on them)
+    """
+
+    __slots__ = ("cells", "origin", "symbols", "ids")
+
+    def __init__(self, symbols: List[str]):
+        self.cells = bytearray(16)
+        self.origin = 0
+        self.symbols: List[str] = list(symbols)
+        self.ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+
+    @classmethod
+    def from_string(cls, content: str, offset: int, symbols: List[str]) -> "Tape":
+        tape = cls(symbols)
+        tape.cells = bytearray(tape.intern(ch) for ch in content) + bytearray(16)
+        tape.origin = -offset
+        return tape
+
+    @property
+    def blank(self) -> str:
+        return self.symbols[0]
+
+    def intern(self, ch: str) -> int:
+        sym = self.ids.get(ch)
+        if sym is None:
+            if len(self.symbols) >= MAX_SYMBOLS:
+                raise TMSpecError(f"tape supports at most {MAX_SYMBOLS} distinct symbols")
+            sym = len(self.symbols)
+            self.symbols.append(ch)
+            self.ids[ch] = sym
+        return sym
+
+    def ensure(self, pos: int) -> int:
+        """
+        Grows the backing array (doubling) so that pos is addressable; returns its index.
+        """
+        i = pos + self.origin
+        if i < 0:
+            extra = max(-i, len(self.cells))
+            self.cells[0:0] = bytes(extra)
+            self.origin += extra
+            i += extra
+        elif i >= len(self.cells):
+            self.cells.extend(bytes(max(i - len(self.cells) + 1, len(self.cells))))
+        return i
+
+    def read(self, pos: int) -> int:
+        i = pos + self.origin
+        if 0 <= i < len(self.cells):
+            return self.cells[i]
+        return 0
+
+    def write(self, pos: int, sym: int) -> None:
+        self.cells[self.ensure(pos)] = sym
+
+    def slice(self, lo: int, hi: int) -> memoryview:
+        """
+        Zero-copy view of cells lo..hi (inclusive).
+        """
+        self.ensure(lo)
+        self.ensure(hi)
+        return memoryview(self.cells)[lo + self.origin: hi + self.origin + 1]
+
+    def bounds(self) -> Optional[Tuple[int, int]]:
+        """
+        (first, last) non-blank positions, or None for an all-blank tape.
+        """
+        cells = self.cells
+        lo = next((i for i, c in enumerate(cells) if c), None)
+        if lo is None:
+            return None
+        hi = len(cells) - 1
+        while not cells[hi]:
+            hi -= 1
+        return lo - self.origin, hi - self.origin
+
+    def to_string(self) -> Tuple[str, int]:
+        """
+        Compact form: the non-blank span as one string plus the position of its first cell.
+        """
+        b = self.bounds()
+        if b is None:
+            return "", 0
+        lo, hi = b
+        symbols = self.symbols
+        return "".join(symbols[c] for c in self.slice(lo, hi)), lo
+
+    def copy(self) -> "Tape":
+        tape = Tape.__new__(Tape)
+        tape.cells = bytearray(self.cells)
+        tape.origin = self.origin
+        tape.symbols = list(self.symbols)
+        tape.ids = dict(self.ids)
+        return tape
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.cells)
+
+
+def tape_from_config(config: Dict[str, Any], symbols: List[str], head: int = 0) -> Tape:
+    """
+    Accepts both the compact config form ("tape": str, "offset": int) and the
+    legacy sparse map ("tape": {index: symbol}, keys possibly strings from JSON).
+    The tape content may not lie further than MAX_TAPE_SPAN from the head.
+    """
+    raw = config.get("tape") or ""
+    if isinstance(raw, dict):
+        cells = {int(k): ch for k, ch in raw.items()}
+        if cells and max(abs(head - min(cells)), abs(max(cells) - head)) > MAX_TAPE_SPAN:
+            raise TMSpecError("config.head is too far from the tape content")
+        tape = Tape(symbols)
+        for pos, ch in cells.items():
+            tape.write(pos, tape.intern(ch))
+        return tape
+    offset = int(config.get("offset", 0))
+    if abs(head - offset) > MAX_TAPE_SPAN:
+        raise TMSpecError("config.head is too far from the tape content")
+    return Tape.from_string(str(raw), offset, symbols)
 
 
 def init_config(input_str: str, blank: str, start_state: str) -> Dict[str, Any]:
@@ -120,150 +261,847 @@ def init_config(input_str: str, blank: str, start_state: str) -> Dict[str, Any]:
       "state": ...,
       "head": 0,
       "step": 0,
-      "tape": {0:"a", 1:"b", ...}  # sparse map
+      "tape": "ab...",   # non-blank span of the tape
+      "offset": 0        # tape position of tape[0]
     }
     """
-    tape: Dict[int, str] = {}
-    for i, ch in enumerate(input_str):
-        tape[i] = ch
-    return {"state": start_state, "head": 0, "step": 0, "tape": tape}
+    return {"state": start_state, "head": 0, "step": 0, "tape": input_str, "offset": 0}
 
 
-def read_tape(tape: Dict[int, str], head: int, blank: str) -> str:
-    return tape.get(head, blank)
+def snapshot_window(tape: Tape, head: int, radius: int = 12) -> List[Dict[str, Any]]:
+    """
+    Returns a list of cells around the head:
+    [{"index": i, "symbol": "a", "is_head": True}, ...]
+    """
+    lo = head - radius
+    symbols = tape.symbols
+    return [
+        {"index": lo + k, "symbol": symbols[c], "is_head": lo + k == head}
+        for k, c in enumerate(tape.slice(lo, head + radius))
+    ]
+
+
+# polynomial tape hashing for loop detection (Mersenne prime modulus)
+_HASH_MOD = (1 << 61) - 1
+_HASH_BASE = 1_000_003
+_HASH_BASE_INV = pow(_HASH_BASE, -1, _HASH_MOD)
 
 
-def write_tape(tape: Dict[int, str], head: int, symbol: str, blank: str) -> None:
-    if symbol == blank:
-        # keep sparse: remove blank cells
-        tape.pop(head, None)
-    else:
-        tape[head] = symbol
+def _tape_hash(tape: Tape) -> int:
+    h = 0
+    origin = tape.origin
+    for i, c in enumerate(tape.cells):
+        if c:
+            h = (h + c * pow(_HASH_BASE, i - origin, _HASH_MOD)) % _HASH_MOD
+    return h
 
 
-def snapshot_window(tape: Dict[int, str], head: int, blank: str, radius: int = 12) -> List[Dict[str, Any]]:
+class TMRunState:
     """
-    Returns a list of cells around the head:
-    [{"index": i, "symbol": "a", "is_head": True}, ...]
+    Mutable position of one run on a CompiledTM.
     """
-    cells = []
-    for i in range(head - radius, head + radius + 1):
-        cells.append({
-            "index": i,
-            "symbol": tape.get(i, blank),
-            "is_head": i == head
-        })
-    return cells
 
+    __slots__ = ("state", "head", "step", "tape")
 
-def step_tm(spec: Dict[str, Any], config: Dict[str, Any], window_radius: int = 12) -> Dict[str, Any]:
+    def __init__(self, state: int, head: int, step: int, tape: Tape):
+        self.state = state
+        self.head = head
+        self.step = step
+        self.tape = tape
+
+    @property
+    def nbytes(self) -> int:
+        return self.tape.nbytes
+
+
+class TMMultiRunState:
     """
-    One deterministic TM step. Stateless: client sends spec+config, server returns updated config and step info.
+    Mutable position of one run on a CompiledMultiTM: one head and one tape per tape index.
     """
-    validate_tm_spec(spec)
-    tm = build_transition_map(spec)
 
-    state = config.get("state")
-    head = int(config.get("head", 0))
-    step_no = int(config.get("step", 0))
-    tape_raw = config.get("tape") or {}
+    __slots__ = ("state", "heads", "step", "tapes")
+
+    def __init__(self, state: int, heads: List[int], step: int, tapes: List[Tape]):
+        self.state = state
+        self.heads = heads
+        self.step = step
+        self.tapes = tapes
+
+    @property
+    def head(self) -> int:
+        return self.heads[0]
 
-    # JSON keys may arrive as strings
-    tape: Dict[int, str] = {}
-    for k, v in tape_raw.items():
-        tape[int(k)] = v
+    @property
+    def nbytes(self) -> int:
+        return sum(t.nbytes for t in self.tapes)
 
-    blank = spec.get("blank", "_")
-    accept_states = set(spec.get("accept_states") or [])
-    reject_states = set(spec.get("reject_states") or [])
 
-    # halting checks (before stepping)
-    if state in accept_states:
+class _CycleDetector:
+    """
+    Brent's cycle detection over a deterministic sequence of configurations.
+    `key` is a cheap hash key; `exact` builds a canonical snapshot and is only
+    called on a key match or when a new checkpoint is saved.
+    """
+
+    __slots__ = ("saved_key", "saved_exact", "power", "lam")
+
+    def __init__(self, key: Any, exact: Any):
+        self.saved_key = key
+        self.saved_exact = exact
+        self.power = 1
+        self.lam = 1
+
+    def check(self, key: Any, exact: Callable[[], Any]) -> Optional[int]:
+        """
+        Returns the cycle length when the new configuration repeats the checkpoint.
+        """
+        if key == self.saved_key and self.saved_exact == exact():
+            return self.lam
+        if self.power == self.lam:
+            self.saved_key = key
+            self.saved_exact = exact()
+            self.power *= 2
+            self.lam = 0
+        self.lam += 1
+        return None
+
+
+class _InternedSpec:
+    """
+    State/symbol interning shared by the compiled machines (CompiledTM,
+    CompiledMultiTM, ntm_engine.CompiledNTM). Symbol id 0 is always the blank.
+    """
+
+    def _intern(self, spec: Dict[str, Any]) -> None:
+        self.blank: str = spec.get("blank", "_")
+        self.states: List[str] = list(dict.fromkeys(spec["states"]))
+        self.state_ids: Dict[str, int] = {s: i for i, s in enumerate(self.states)}
+
+        self.symbols: List[str] = [self.blank] + [
+            s for s in dict.fromkeys(spec["tape_alphabet"]) if s != self.blank
+        ]
+        if len(self.symbols) > MAX_SYMBOLS:
+            raise TMSpecError(f"tape_alphabet may have at most {MAX_SYMBOLS} symbols")
+        self.symbol_ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+
+        self.start: int = self.state_ids[spec["start_state"]]
+        accept_states = set(spec.get("accept_states") or [])
+        reject_states = set(spec.get("reject_states") or [])
+        self.accepting: List[bool] = [s in accept_states for s in self.states]
+        self.rejecting: List[bool] = [s in reject_states for s in self.states]
+
+
+class CompiledTM(_InternedSpec):
+    """
+    A TM spec validated once and interned into integer ids.
+
+    States and tape symbols are mapped to dense ints and the transition function
+    becomes a flat table indexed by ``state * MAX_SYMBOLS + symbol``, so the run
+    loop never touches the spec dict again. Symbol id 0 is always the blank;
+    foreign input characters get ids past the alphabet, whose table cells are empty.
+    """
+
+    k = 1  # number of tapes
+
+    def __init__(self, spec: Dict[str, Any]):
+        validate_tm_spec(spec)
+        self._intern(spec)
+        self._build_table(spec)
+
+    def _build_table(self, spec: Dict[str, Any]) -> None:
+        # table cell: (to_state_id, write_symbol_id, head_delta) or None
+        self.table: List[Optional[Tuple[int, int, int]]] = [None] * (len(self.states) * MAX_SYMBOLS)
+        for t in (spec.get("transitions") or []):
+            frm = self.state_ids[t["from"]]
+            read = self.symbol_ids[t["read"]]
+            self.table[frm * MAX_SYMBOLS + read] = (
+                self.state_ids[t["to"]],
+                self.symbol_ids[t["write"]],
+                _MOVE_DELTA[t["move"]],
+            )
+
+    # --------------------------------------------------------
+    # JSON configs <-> run states
+    # --------------------------------------------------------
+
+    def load(self, config: Dict[str, Any]) -> TMRunState:
+        """
+        Interns a JSON config (compact or legacy tape form) into a mutable run state.
+        """
+        state_name = config.get("state")
+        state = self.state_ids.get(state_name)
+        if state is None:
+            raise TMSpecError(f"config.state '{state_name}' not in states")
+        head = int(config.get("head", 0))
+        tape = tape_from_config(config, self.symbols, head)
+        return TMRunState(state, head, int(config.get("step", 0)), tape)
+
+    def start_run(self, input_str: str) -> TMRunState:
+        return TMRunState(self.start, 0, 0, Tape.from_string(input_str, 0, self.symbols))
+
+    def config_of(self, rs: TMRunState) -> Dict[str, Any]:
+        return self._config(rs.state, rs.head, rs.step, rs.tape)
+
+    def window_of(self, rs: TMRunState, radius: int = 12) -> List[Dict[str, Any]]:
+        return snapshot_window(rs.tape, rs.head, radius)
+
+    def _config(self, state: int, head: int, step_no: int, tape: Tape) -> Dict[str, Any]:
+        tape_str, offset = tape.to_string()
         return {
-            "halted": True,
-            "accepted": True,
-            "reason": "accept_state",
-            "config": {"state": state, "head": head, "step": step_no, "tape": tape},
-            "window": snapshot_window(tape, head, blank, window_radius),
+            "state": self.states[state],
+            "head": head,
+            "step": step_no,
+            "tape": tape_str,
+            "offset": offset,
         }
-    if state in reject_states:
+
+    def _transition(self, tape: Tape, frm: int, read: int, to: int, write: int, delta: int) -> Dict[str, Any]:
+        return {
+            "from": self.states[frm],
+            "read": tape.symbols[read],
+            "to": self.states[to],
+            "write": self.symbols[write],
+            "move": _DELTA_MOVE[delta],
+        }
+
+    # --------------------------------------------------------
+    # execution
+    # --------------------------------------------------------
+
+    def advance(self, rs: TMRunState, n: int = 1) -> Dict[str, Any]:
+        """
+        Applies up to n steps to rs in place and reports how the last one went
+        (halted/accepted/reason, plus the last transition when one was taken).
+        """
+        table = self.table
+        accepting = self.accepting
+        rejecting = self.rejecting
+        tape = rs.tape
+        cells, origin = tape.cells, tape.origin
+        state, head = rs.state, rs.head
+        last: Optional[Tuple[int, int, int, int, int]] = None
+        res: Dict[str, Any] = {"halted": False, "accepted": None, "reason": "transition"}
+
+        for _ in range(n):
+            if accepting[state] or rejecting[state]:
+                res = {
+                    "halted": True,
+                    "accepted": accepting[state],
+                    "reason": "accept_state" if accepting[state] else "reject_state",
+                }
+                last = None
+                break
+
+            i = head + origin
+            if i < 0 or i >= len(cells):
+                i = tape.ensure(head)
+                cells, origin = tape.cells, tape.origin
+            read = cells[i]
+            tr = table[state * MAX_SYMBOLS + read]
+            if tr is None:
+                res = {"halted": True, "accepted": False, "reason": "stuck_no_transition"}
+                last = None
+                break
+
+            to, write, delta = tr
+            cells[i] = write
+            last = (state, read, to, write, delta)
+            state = to
+            head += delta
+            rs.step += 1
+
+            if accepting[state] or rejecting[state]:
+                res = {"halted": True, "accepted": accepting[state], "reason": "transition"}
+                break
+
+        rs.state, rs.head = state, head
+        if last is not None:
+            res["transition"] = self._transition(tape, *last)
+        return res
+
+    def step(self, config: Dict[str, Any], window_radius: int = 12, n: int = 1) -> Dict[str, Any]:
+        """
+        Up to n steps from a JSON config. Same result shape as ``step_tm``.
+        """
+        rs = self.load(config)
+        res = self.advance(rs, n)
+        res["config"] = self.config_of(rs)
+        res["window"] = self.window_of(rs, window_radius)
+        return res
+
+    def run(
+        self,
+        input_str: str,
+        max_steps: int = 500,
+        window_radius: int = 12,
+        trace_mode: str = "full",
+        keyframe_every: int = 256,
+        detect_loops: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Runs until halt or max_steps in a tight loop over the interned table.
+        Returns the same contract as ``run_tm``. trace_mode:
+          - "full":  list of step_tm-shaped dicts (config + window per step)
+          - "delta": one [from, read, to, write, move, head] row per step plus
+                     tape keyframes every keyframe_every steps (see trace_window)
+          - "none":  no trace
+
+        With detect_loops, a deterministic machine that revisits a configuration
+        (state, head, tape) halts early with reason "loop_detected" and the
+        cycle length. Configurations are compared by an incrementally updated
+        polynomial tape hash (Brent's cycle detection, constant extra memory);
+        a hash match is confirmed against an exact snapshot before reporting.
+        """
+        if trace_mode not in ("full", "delta", "none"):
+            raise TMSpecError("trace_mode must be one of: full, delta, none")
+        full = trace_mode == "full"
+        delta_mode = trace_mode == "delta"
+        keyframe_every = max(1, keyframe_every)
+
+        tape = Tape.from_string(input_str, 0, self.symbols)
+        cells, origin = tape.cells, tape.origin
+
+        table = self.table
+        accepting = self.accepting
+        rejecting = self.rejecting
+
+        state = self.start
+        head = 0
+        step_no = 0
+        trace: List[Dict[str, Any]] = []
+        rows: List[Tuple[int, int, int, int, int, int]] = []
+        keyframes: List[Dict[str, Any]] = []
+        if delta_mode:
+            keyframes.append(self._keyframe(state, head, step_no, tape))
+
+        if detect_loops:
+            # tape hash = sum(sym(p) * BASE^p) mod _HASH_MOD, pos_pow = BASE^head
+            tape_hash = _tape_hash(tape)
+            pos_pow = 1
+            detector = _CycleDetector((state, head, tape_hash), (state, head, tape.to_string()))
+
+        def finish(halted: bool, accepted: Optional[bool], reason: str, **extra: Any) -> Dict[str, Any]:
+            res = {
+                "halted": halted,
+                "accepted": accepted,
+                "reason": reason,
+                **extra,
+                "final_config": self._config(state, head, step_no, tape),
+            }
+            if full:
+                res["trace"] = trace
+            elif delta_mode:
+                res["trace"] = {
+                    "format": "delta",
+                    "blank": self.blank,
+                    "states": self.states,
+                    "symbols": self.symbols,
+                    "keyframe_every": keyframe_every,
+                    "keyframes": keyframes,
+                    "steps": rows,
+                }
+            else:
+                res["trace"] = []
+            return res
+
+        for _ in range(max_steps):
+            if accepting[state] or rejecting[state]:
+                reason = "accept_state" if accepting[state] else "reject_state"
+                if full:
+                    trace.append({
+                        "halted": True,
+                        "accepted": accepting[state],
+                        "reason": reason,
+                        "config": self._config(state, head, step_no, tape),
+                        "window": snapshot_window(tape, head, window_radius),
+                    })
+                return finish(True, accepting[state], reason)
+
+            i = head + origin
+            if i < 0 or i >= len(cells):
+                i = tape.ensure(head)
+                cells, origin = tape.cells, tape.origin
+            read = cells[i]
+            tr = table[state * MAX_SYMBOLS + read]
+            if tr is None:
+                if full:
+                    trace.append({
+                        "halted": True,
+                        "accepted": False,
+                        "reason": "stuck_no_transition",
+                        "config": self._config(state, head, step_no, tape),
+                        "window": snapshot_window(tape, head, window_radius),
+                    })
+                return finish(True, False, "stuck_no_transition")
+
+            to, write, delta = tr
+            cells[i] = write
+            prev = state
+            state = to
+            head += delta
+            step_no += 1
+
+            halted = accepting[state] or rejecting[state]
+            if full:
+                trace.append({
+                    "halted": halted,
+                    "accepted": True if accepting[state] else (False if rejecting[state] else None),
+                    "reason": "transition",
+                    "transition": self._transition(tape, prev, read, state, write, delta),
+                    "config": self._config(state, head, step_no, tape),
+                    "window": snapshot_window(tape, head, window_radius),
+                })
+                cells, origin = tape.cells, tape.origin
+            elif delta_mode:
+                rows.append((prev, read, state, write, delta, head))
+                if step_no % keyframe_every == 0:
+                    keyframes.append(self._keyframe(state, head, step_no, tape))
+                    cells, origin = tape.cells, tape.origin
+            if halted:
+                return finish(True, accepting[state], "transition")
+
+            if detect_loops:
+                tape_hash = (tape_hash + (write - read) * pos_pow) % _HASH_MOD
+                if delta == 1:
+                    pos_pow = pos_pow * _HASH_BASE % _HASH_MOD
+                elif delta == -1:
+                    pos_pow = pos_pow * _HASH_BASE_INV % _HASH_MOD
+                cycle = detector.check((state, head, tape_hash), lambda: (state, head, tape.to_string()))
+                if cycle is not None:
+                    return finish(True, False, "loop_detected", cycle_length=cycle)
+
+        return finish(False, None, "max_steps_reached")
+
+    def decide(self, input_str: str, max_steps: int = 5000, detect_loops: bool = True) -> Tuple[str, int]:
+        """
+        Runs one word without any trace and returns (verdict, steps), where verdict
+        is "accept", "reject", "timeout" (step budget exhausted) or "loop".
+        """
+        res = self.run(input_str, max_steps=max_steps, trace_mode="none", detect_loops=detect_loops)
+        steps = res["final_config"]["step"]
+        if res["accepted"]:
+            return "accept", steps
+        if res["reason"] == "loop_detected":
+            return "loop", steps
+        if res["reason"] == "max_steps_reached":
+            return "timeout", steps
+        return "reject", steps
+
+    def stream(
+        self,
+        input_str: str,
+        max_steps: int = 500,
+        every: int = 1,
+        window_radius: int = 12,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily runs the machine and yields one small frame every `every` steps
+        (state/head/step/window and the last transition, like a session step).
+        The last frame carries "final": True and the full final_config.
+        Memory stays constant in the run length: nothing is accumulated here.
+        """
+        every = max(1, every)
+        rs = self.start_run(input_str)
+
+        def frame(res: Dict[str, Any]) -> Dict[str, Any]:
+            out = {
+                **res,
+                "state": self.states[rs.state],
+                "head": rs.head,
+                "step": rs.step,
+                "window": self.window_of(rs, window_radius),
+            }
+            if self.k > 1:
+                out["windows"] = self.windows_of(rs, window_radius)
+            return out
+
+        yield frame({"halted": False, "accepted": None, "reason": "start"})
+        while True:
+            res = self.advance(rs, min(every, max_steps - rs.step))
+            if not res["halted"] and rs.step >= max_steps:
+                res = {**res, "halted": False, "accepted": None, "reason": "max_steps_reached"}
+            if res["halted"] or rs.step >= max_steps:
+                yield {**frame(res), "final": True, "final_config": self.config_of(rs)}
+                return
+            yield frame(res)
+
+    def _keyframe(self, state: int, head: int, step_no: int, tape: Tape) -> Dict[str, Any]:
+        tape_str, offset = tape.to_string()
+        return {"step": step_no, "state": state, "head": head, "tape": tape_str, "offset": offset}
+
+
+class CompiledMultiTM(CompiledTM):
+    """
+    k-tape deterministic TM ("tapes": k in the spec; read/write/move are lists).
+
+    The transition table is indexed by ``state * width**k + sum(sym_i * width**i)``,
+    i.e. by the combined tuple of symbols under all heads, so a step is one table
+    lookup followed by k writes/moves. The input is written on tape 0, the other
+    tapes start blank. The last column of each tape (width - 1) stands for any
+    foreign input character.
+    """
+
+    def _build_table(self, spec: Dict[str, Any]) -> None:
+        self.k = int(spec["tapes"])
+        self.width = len(self.symbols) + 1
+        self.row = self.width ** self.k
+        if len(self.states) * self.row > MAX_MULTI_TABLE:
+            raise TMSpecError("too many tapes/symbols for a multi-tape machine")
+
+        # table cell: (to_state_id, write_symbol_ids, head_deltas) or None
+        self.table: List[Optional[Tuple[int, Tuple[int, ...], Tuple[int, ...]]]] = [None] * (len(self.states) * self.row)
+        for t in (spec.get("transitions") or []):
+            index = self.state_ids[t["from"]] * self.row
+            for i, read in enumerate(t["read"]):
+                index += self.symbol_ids[read] * self.width ** i
+            self.table[index] = (
+                self.state_ids[t["to"]],
+                tuple(self.symbol_ids[w] for w in t["write"]),
+                tuple(_MOVE_DELTA[m] for m in t["move"]),
+            )
+
+    # --------------------------------------------------------
+    # JSON configs <-> run states
+    # --------------------------------------------------------
+
+    def load(self, config: Dict[str, Any]) -> TMMultiRunState:
+        """
+        Accepts the multi-tape config ("heads" + "tapes") and, for a fresh
+        /tm/init config, the single-tape form (input on tape 0).
+        """
+        state_name = config.get("state")
+        state = self.state_ids.get(state_name)
+        if state is None:
+            raise TMSpecError(f"config.state '{state_name}' not in states")
+
+        if "tapes" in config:
+            heads = [int(h) for h in config.get("heads") or []]
+            tape_configs = config["tapes"]
+        else:
+            heads = [int(config.get("head", 0))]
+            tape_configs = [config]
+        if len(heads) != len(tape_configs) or not 1 <= len(heads) <= self.k:
+            raise TMSpecError(f"config must have one head and one tape per tape (k={self.k})")
+
+        tapes = []
+        for head, tc in zip(heads, tape_configs):
+            tapes.append(tape_from_config(tc, self.symbols, head))
+        while len(tapes) < self.k:
+            heads.append(0)
+            tapes.append(Tape(self.symbols))
+        return TMMultiRunState(state, heads, int(config.get("step", 0)), tapes)
+
+    def start_run(self, input_str: str) -> TMMultiRunState:
+        tapes = [Tape.from_string(input_str, 0, self.symbols)] + [Tape(self.symbols) for _ in range(self.k - 1)]
+        return TMMultiRunState(self.start, [0] * self.k, 0, tapes)
+
+    def config_of(self, rs: TMMultiRunState) -> Dict[str, Any]:
+        return self._multi_config(rs.state, rs.heads, rs.step, rs.tapes)
+
+    def window_of(self, rs: TMMultiRunState, radius: int = 12) -> List[Dict[str, Any]]:
+        return snapshot_window(rs.tapes[0], rs.heads[0], radius)
+
+    def windows_of(self, rs: TMMultiRunState, radius: int = 12) -> List[List[Dict[str, Any]]]:
+        return [snapshot_window(t, h, radius) for t, h in zip(rs.tapes, rs.heads)]
+
+    def _multi_config(self, state: int, heads: List[int], step_no: int, tapes: List[Tape]) -> Dict[str, Any]:
+        serialized = []
+        for t in tapes:
+            tape_str, offset = t.to_string()
+            serialized.append({"tape": tape_str, "offset": offset})
         return {
-            "halted": True,
-            "accepted": False,
-            "reason": "reject_state",
-            "config": {"state": state, "head": head, "step": step_no, "tape": tape},
-            "window": snapshot_window(tape, head, blank, window_radius),
+            "state": self.states[state],
+            "head": heads[0],
+            "step": step_no,
+            "heads": list(heads),
+            "tapes": serialized,
         }
 
-    read = read_tape(tape, head, blank)
-    tr = tm.get((state, read))
-    if tr is None:
+    def _multi_transition(
+        self,
+        tapes: List[Tape],
+        frm: int,
+        reads: List[int],
+        to: int,
+        writes: Tuple[int, ...],
+        deltas: Tuple[int, ...],
+    ) -> Dict[str, Any]:
         return {
-            "halted": True,
-            "accepted": False,
-            "reason": "stuck_no_transition",
-            "config": {"state": state, "head": head, "step": step_no, "tape": tape},
-            "window": snapshot_window(tape, head, blank, window_radius),
+            "from": self.states[frm],
+            "read": [t.symbols[r] for t, r in zip(tapes, reads)],
+            "to": self.states[to],
+            "write": [self.symbols[w] for w in writes],
+            "move": [_DELTA_MOVE[d] for d in deltas],
         }
 
-    # apply transition
-    write_tape(tape, head, tr.write, blank)
-    new_head = head
-    if tr.move == "L":
-        new_head -= 1
-    elif tr.move == "R":
-        new_head += 1
+    # --------------------------------------------------------
+    # execution
+    # --------------------------------------------------------
 
-    new_state = tr.to
-    new_step = step_no + 1
+    def _lookup(self, rs: TMMultiRunState) -> Tuple[List[int], Optional[Tuple[int, Tuple[int, ...], Tuple[int, ...]]]]:
+        foreign = self.width - 1
+        reads = [t.read(h) for t, h in zip(rs.tapes, rs.heads)]
+        index = rs.state * self.row
+        scale = 1
+        for r in reads:
+            index += (r if r < foreign else foreign) * scale
+            scale *= self.width
+        return reads, self.table[index]
 
-    # halting checks (after stepping) optional; UI can read state
-    halted = (new_state in accept_states) or (new_state in reject_states)
+    def _apply(self, rs: TMMultiRunState, tr: Tuple[int, Tuple[int, ...], Tuple[int, ...]]) -> None:
+        to, writes, deltas = tr
+        heads = rs.heads
+        for i, t in enumerate(rs.tapes):
+            t.write(heads[i], writes[i])
+            heads[i] += deltas[i]
+        rs.state = to
+        rs.step += 1
 
-    return {
-        "halted": halted,
-        "accepted": True if new_state in accept_states else (False if new_state in reject_states else None),
-        "reason": "transition",
-        "transition": {
-            "from": state,
-            "read": read,
-            "to": new_state,
-            "write": tr.write,
-            "move": tr.move
-        },
-        "config": {"state": new_state, "head": new_head, "step": new_step, "tape": tape},
-        "window": snapshot_window(tape, new_head, blank, window_radius),
-    }
+    def advance(self, rs: TMMultiRunState, n: int = 1) -> Dict[str, Any]:
+        accepting = self.accepting
+        rejecting = self.rejecting
+        last = None
+        res: Dict[str, Any] = {"halted": False, "accepted": None, "reason": "transition"}
+
+        for _ in range(n):
+            state = rs.state
+            if accepting[state] or rejecting[state]:
+                res = {
+                    "halted": True,
+                    "accepted": accepting[state],
+                    "reason": "accept_state" if accepting[state] else "reject_state",
+                }
+                last = None
+                break
+
+            reads, tr = self._lookup(rs)
+            if tr is None:
+                res = {"halted": True, "accepted": False, "reason": "stuck_no_transition"}
+                last = None
+                break
+
+            self._apply(rs, tr)
+            last = (state, reads, *tr)
+            if accepting[rs.state] or rejecting[rs.state]:
+                res = {"halted": True, "accepted": accepting[rs.state], "reason": "transition"}
+                break
 
+        if last is not None:
+            res["transition"] = self._multi_transition(rs.tapes, *last)
+        return res
 
-def run_tm(spec: Dict[str, Any], input_str: str, max_steps: int = 500, window_radius: int = 12) -> Dict[str, Any]:
+    def step(self, config: Dict[str, Any], window_radius: int = 12, n: int = 1) -> Dict[str, Any]:
+        rs = self.load(config)
+        res = self.advance(rs, n)
+        res["config"] = self.config_of(rs)
+        res["window"] = self.window_of(rs, window_radius)
+        res["windows"] = self.windows_of(rs, window_radius)
+        return res
+
+    def run(
+        self,
+        input_str: str,
+        max_steps: int = 500,
+        window_radius: int = 12,
+        trace_mode: str = "full",
+        keyframe_every: int = 256,
+        detect_loops: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Same contract as CompiledTM.run. Delta traces are single-tape only.
+        """
+        if trace_mode not in ("full", "none"):
+            raise TMSpecError("multi-tape runs support trace_mode 'full' or 'none'")
+        full = trace_mode == "full"
+
+        rs = self.start_run(input_str)
+        accepting = self.accepting
+        rejecting = self.rejecting
+        trace: List[Dict[str, Any]] = []
+
+        def entry(**fields: Any) -> Dict[str, Any]:
+            return {
+                **fields,
+                "config": self.config_of(rs),
+                "window": self.window_of(rs, window_radius),
+                "windows": self.windows_of(rs, window_radius),
+            }
+
+        def finish(halted: bool, accepted: Optional[bool], reason: str, **extra: Any) -> Dict[str, Any]:
+            return {
+                "halted": halted,
+                "accepted": accepted,
+                "reason": reason,
+                **extra,
+                "final_config": self.config_of(rs),
+                "trace": trace,
+            }
+
+        if detect_loops:
+            # one polynomial hash (and BASE^head) per tape, updated on every write/move
+            hashes = [_tape_hash(t) for t in rs.tapes]
+            pows = [1] * self.k
+            exact = lambda: (rs.state, tuple(rs.heads), tuple(t.to_string() for t in rs.tapes))
+            detector = _CycleDetector((rs.state, tuple(rs.heads), tuple(hashes)), exact())
+
+        for _ in range(max_steps):
+            state = rs.state
+            if accepting[state] or rejecting[state]:
+                reason = "accept_state" if accepting[state] else "reject_state"
+                if full:
+                    trace.append(entry(halted=True, accepted=accepting[state], reason=reason))
+                return finish(True, accepting[state], reason)
+
+            reads, tr = self._lookup(rs)
+            if tr is None:
+                if full:
+                    trace.append(entry(halted=True, accepted=False, reason="stuck_no_transition"))
+                return finish(True, False, "stuck_no_transition")
+
+            self._apply(rs, tr)
+            to, writes, deltas = tr
+
+            halted = accepting[to] or rejecting[to]
+            if full:
+                trace.append(entry(
+                    halted=halted,
+                    accepted=True if accepting[to] else (False if rejecting[to] else None),
+                    reason="transition",
+                    transition=self._multi_transition(rs.tapes, state, reads, to, writes, deltas),
+                ))
+            if halted:
+                return finish(True, accepting[to], "transition")
+
+            if detect_loops:
+                for i in range(self.k):
+                    hashes[i] = (hashes[i] + (writes[i] - reads[i]) * pows[i]) % _HASH_MOD
+                    if deltas[i] == 1:
+                        pows[i] = pows[i] * _HASH_BASE % _HASH_MOD
+                    elif deltas[i] == -1:
+                        pows[i] = pows[i] * _HASH_BASE_INV % _HASH_MOD
+                cycle = detector.check((to, tuple(rs.heads), tuple(hashes)), exact)
+                if cycle is not None:
+                    return finish(True, False, "loop_detected", cycle_length=cycle)
+
+        return finish(False, None, "max_steps_reached")
+
+
+def compile_tm(spec: Dict[str, Any]) -> CompiledTM:
+    """
+    Validates the spec and returns its compiled form (CompiledMultiTM for "tapes" > 1).
+    Raises TMSpecError on invalid spec.
+    """
+    if spec.get("tapes", 1) != 1:
+        return CompiledMultiTM(spec)
+    return CompiledTM(spec)
+
+
+def step_tm(spec: Dict[str, Any], config: Dict[str, Any], window_radius: int = 12, n: int = 1) -> Dict[str, Any]:
+    """
+    One deterministic TM step (or n). Stateless: client sends spec+config, server returns updated config and step info.
+    """
+    return compile_tm(spec).step(config, window_radius=window_radius, n=n)
+
+
+def run_tm(
+    spec: Dict[str, Any],
+    input_str: str,
+    max_steps: int = 500,
+    window_radius: int = 12,
+    trace_mode: str = "full",
+    keyframe_every: int = 256,
+    detect_loops: bool = False,
+) -> Dict[str, Any]:
     """
     Runs until halt or max_steps, returns trace.
+    The spec is validated and compiled once; the loop itself runs on integer ids.
     """
-    validate_tm_spec(spec)
-    blank = spec.get("blank", "_")
-    start = spec["start_state"]
+    return compile_tm(spec).run(
+        input_str=input_str,
+        max_steps=max_steps,
+        window_radius=window_radius,
+        trace_mode=trace_mode,
+        keyframe_every=keyframe_every,
+        detect_loops=detect_loops,
+    )
 
-    config = init_config(input_str=input_str, blank=blank, start_state=start)
-    trace = []
 
-    for _ in range(max_steps):
-        res = step_tm(spec, config, window_radius=window_radius)
-        trace.append(res)
-        config = res["config"]
-        if res.get("halted"):
-            return {
-                "halted": True,
-                "accepted": res.get("accepted"),
-                "reason": res.get("reason"),
-                "final_config": config,
-                "trace": trace
-            }
+def trace_window(trace: Dict[str, Any], step: int, window_radius: int = 12) -> Dict[str, Any]:
+    """
+    Rebuilds the configuration and tape window at `step` from a delta trace:
+    starts at the nearest keyframe at or before `step` and replays the writes.
+    """
+    try:
+        if trace.get("format") != "delta":
+            raise TMSpecError("trace.format must be 'delta'")
+
+        states: List[str] = trace["states"]
+        symbols: List[str] = trace["symbols"]
+        rows: List[List[int]] = trace.get("steps") or []
+        keyframes: List[Dict[str, Any]] = trace.get("keyframes") or []
+
+        if step < 0 or step > len(rows):
+            raise TMSpecError(f"step must be between 0 and {len(rows)}")
+
+        base = None
+        for kf in keyframes:
+            if kf["step"] <= step and (base is None or kf["step"] > base["step"]):
+                base = kf
+        if base is None:
+            raise TMSpecError("trace has no keyframe at or before the requested step")
+
+        # heads come from the client: keep them as close to the tape as load() does
+        origin = int(base["offset"])
+        tape = Tape.from_string(base["tape"], origin, symbols)
+        state = base["state"]
+        head = int(base["head"])
+        if abs(head - origin) > MAX_TAPE_SPAN:
+            raise TMSpecError("keyframe head is too far from the tape content")
+        # ids come from the client too: negative ones would silently wrap around
+        if not 0 <= state < len(states):
+            raise TMSpecError(f"keyframe state id {state} is out of range")
+        for frm, read, to, write, move, new_head in rows[base["step"]:step]:
+            if abs(new_head - origin) > MAX_TAPE_SPAN:
+                raise TMSpecError("trace head is too far from the tape content")
+            if not 0 <= to < len(states) or not 0 <= write < len(symbols):
+                raise TMSpecError("trace state or symbol id is out of range")
+            tape.write(head, write)
+            state, head = to, new_head
+
+        tape_str, offset = tape.to_string()
+        return {
+            "config": {"state": states[state], "head": head, "step": step, "tape": tape_str, "offset": offset},
+            "window": snapshot_window(tape, head, window_radius),
+        }
+
+    except TMSpecError:
+        raise
+    except Exception as e:
+        raise TMSpecError(f"Invalid delta trace: {e}") from e
+
+
+def _decide_chunk(machine: CompiledTM, words: List[str], max_steps: int, detect_loops: bool) -> List[Tuple[str, int]]:
+    return [machine.decide(w, max_steps=max_steps, detect_loops=detect_loops) for w in words]
+
+
+def run_tm_batch(
+    spec: Dict[str, Any],
+    words: List[str],
+    max_steps: int = 5000,
+    detect_loops: bool = True,
+) -> Dict[str, Any]:
+    """
+    Compiles the spec once and decides every word with its own max_steps budget.
+    No traces; returns parallel lists of verdicts and step counts plus totals.
+    Large batches are split across the shared process pool (services.batch_pool).
+    """
+    machine = compile_tm(spec)
+    results = map_chunks(_decide_chunk, machine, words, max_steps, detect_loops)
 
+    verdicts = [v for v, _ in results]
     return {
-        "halted": False,
-        "accepted": None,
-        "reason": "max_steps_reached",
-        "final_config": config,
-        "trace": trace
+        "words": words,
+        "verdicts": verdicts,
+        "steps": [n for _, n in results],
+        "summary": {v: verdicts.count(v) for v in ("accept", "reject", "timeout", "loop")},
     }